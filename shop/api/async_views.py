@@ -0,0 +1,143 @@
+import json
+from base64 import b64decode, b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .filters import ProductFilter, CommentFilter, ReplyFilter
+from .models import Category, Comment, Product, Reply
+from .pagination import KeysetPagination
+from .serializers import CategorySerializer, CommentSerializer, ProductSerializer, ReplySerializer
+from .views import ProductViewSet
+
+renderer = JSONRenderer()
+
+
+def get_page_size(request):
+    try:
+        page_size = int(request.GET[KeysetPagination.page_size_query_param])
+    except (KeyError, ValueError):
+        return api_settings.PAGE_SIZE
+    return min(max(page_size, 1), KeysetPagination.max_page_size)
+
+
+def decode_cursor(request):
+    encoded = request.GET.get(KeysetPagination.cursor_query_param)
+    if encoded is None:
+        return None
+    position, pk = json.loads(b64decode(encoded.encode('ascii')))
+    return position, int(pk)
+
+
+def validate_cursor(queryset, field, cursor):
+    position, pk = cursor
+    if field != 'id':
+        annotation = queryset.query.annotations.get(field)
+        output_field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(field)
+        position = output_field.to_python(position)
+    if any(isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63 for value in (position, pk)):
+        raise ValueError('Cursor value out of range.')
+    return position, pk
+
+
+def encode_cursor(request, obj, field):
+    position = getattr(obj, field)
+    encoded = b64encode(json.dumps([str(position), obj.pk]).encode()).decode('ascii')
+    return replace_query_param(request.build_absolute_uri(), KeysetPagination.cursor_query_param, encoded)
+
+
+def seek(queryset, ordering, cursor):
+    field = ordering.lstrip('-')
+    descending = ordering.startswith('-')
+    queryset = queryset.order_by(ordering, '-id' if descending else 'id')
+    if cursor is None:
+        return queryset
+    position, pk = cursor
+    lookup = 'lt' if descending else 'gt'
+    if field == 'id':
+        return queryset.filter(**{f'id__{lookup}': pk})
+    return queryset.filter(Q(**{f'{field}__{lookup}': position}) | Q(**{field: position, f'id__{lookup}': pk}))
+
+
+def stream_page(request, queryset, serializer_class, ordering):
+    try:
+        cursor = decode_cursor(request)
+        if cursor is not None:
+            cursor = validate_cursor(queryset, ordering.lstrip('-'), cursor)
+    except (TypeError, ValueError, ValidationError):
+        return JsonResponse({'detail': KeysetPagination.invalid_cursor_message}, status=404)
+    page_size = get_page_size(request)
+    queryset = seek(queryset, ordering, cursor)
+    context = {'request': request}
+
+    async def content():
+        yield b'{"results":['
+        last, count, next_link = None, 0, None
+        async for obj in queryset[:page_size + 1].aiterator():
+            if count == page_size:
+                next_link = encode_cursor(request, last, ordering.lstrip('-'))
+                break
+            if count:
+                yield b','
+            yield renderer.render(serializer_class(obj, context=context).data)
+            last, count = obj, count + 1
+        yield b'],"next":' + json.dumps(next_link).encode() + b',"previous":null}'
+
+    return StreamingHttpResponse(content(), content_type='application/json')
+
+
+def filtered_list(request, filterset_class, queryset, serializer_class, ordering):
+    filterset = filterset_class(request.GET, queryset=queryset)
+    if not filterset.is_valid():
+        return JsonResponse(filterset.errors, status=400)
+    return stream_page(request, filterset.qs, serializer_class, ordering)
+
+
+async def retrieve(request, queryset, serializer_class, pk):
+    try:
+        obj = await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        return JsonResponse({'detail': f'No {queryset.model._meta.object_name} matches the given query.'},
+                            status=404)
+    data = serializer_class(obj, context={'request': request}).data
+    return HttpResponse(renderer.render(data), content_type='application/json')
+
+
+@require_GET
+async def product_list(request):
+    ordering = request.GET.get(api_settings.ORDERING_PARAM, '')
+    if ordering.lstrip('-') not in ProductViewSet.ordering_fields:
+        ordering = 'search_rank' if request.GET.get('q', '').strip() else ProductViewSet.ordering[0]
+    return filtered_list(request, ProductFilter, Product.objects.all(), ProductSerializer, ordering)
+
+
+@require_GET
+async def product_detail(request, pk):
+    return await retrieve(request, Product.objects.all(), ProductSerializer, pk)
+
+
+@require_GET
+async def category_list(request):
+    return stream_page(request, Category.objects.all(), CategorySerializer, 'id')
+
+
+@require_GET
+async def category_detail(request, pk):
+    return await retrieve(request, Category.objects.all(), CategorySerializer, pk)
+
+
+@require_GET
+async def comment_list(request):
+    return filtered_list(request, CommentFilter, Comment.objects.select_related('user'), CommentSerializer,
+                         '-created_at')
+
+
+@require_GET
+async def reply_list(request):
+    return filtered_list(request, ReplyFilter, Reply.objects.select_related('user'), ReplySerializer,
+                         '-created_at')
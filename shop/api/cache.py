@@ -0,0 +1,77 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .mixins import request_fingerprint
+
+GENERATION_KEY = 'catalog:generation'
+CHANGED_KEY = 'catalog:changed_at'
+
+stats = Counter(hits=0, misses=0)
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE', 'default')]
+
+
+def get_generation():
+    return get_cache().get_or_set(GENERATION_KEY, 1, timeout=None)
+
+
+def bump_generation():
+    cache = get_cache()
+    cache.set(CHANGED_KEY, timezone.now(), timeout=None)
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, timeout=None)
+        return 2
+
+
+def get_last_modified(model):
+    key = f'catalog:{get_generation()}:{model._meta.label_lower}:last_modified'
+    updated = get_cache().get_or_set(key, lambda: model.objects.aggregate(Max('updated_at'))['updated_at__max'],
+                                     getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300))
+    changed = get_cache().get_or_set(CHANGED_KEY, timezone.now, timeout=None)
+    return max(updated, changed) if updated else changed
+
+
+def make_key(request, view):
+    return f'catalog:{get_generation()}:{request_fingerprint(request, view)}'
+
+
+class CatalogCacheMixin:
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
+
+    def cached(self, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+        self.catalog_cache_key = make_key(request, self)
+        cached = get_cache().get(self.catalog_cache_key)
+        if cached is None:
+            stats['misses'] += 1
+            return handler(request, *args, **kwargs)
+
+        stats['hits'] += 1
+        content, content_type = cached
+        response = HttpResponse(content, content_type=content_type)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'catalog_cache_key', None)
+        if key and response.status_code == 200 and not response.has_header('X-Cache'):
+            response.render()
+            get_cache().set(key, (response.content, response['Content-Type']),
+                            getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300))
+            response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,23 @@
+from collections import Counter
+
+from django.db.models import Count, F
+
+
+def compute(queryset, bucket_width):
+    rows = (
+        queryset
+        .order_by()
+        .values('category', bucket=F('price') / bucket_width)
+        .annotate(count=Count('id'))
+    )
+    categories, prices = Counter(), Counter()
+    for row in rows:
+        categories[row['category']] += row['count']
+        prices[row['bucket']] += row['count']
+    return {
+        'categories': [{'id': category, 'count': count} for category, count in sorted(categories.items())],
+        'price': [
+            {'from': bucket * bucket_width, 'to': (bucket + 1) * bucket_width, 'count': count}
+            for bucket, count in sorted(prices.items())
+        ],
+    }
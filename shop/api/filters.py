@@ -1,12 +1,33 @@
 from django_filters import rest_framework as filters
-from .models import Product
+from . import search
+from .models import Product, Comment, Reply
 
 
 class ProductFilter(filters.FilterSet):
     price_gt = filters.NumberFilter(field_name='price', lookup_expr='gt')
     price_lt = filters.NumberFilter(field_name='price', lookup_expr='lt')
     category = filters.NumberFilter(field_name='category', lookup_expr='exact')
+    q = filters.CharFilter(method='search')
 
     class Meta:
         model = Product
-        fields = ['price_gt', 'price_lt', 'category']
+        fields = ['price_gt', 'price_lt', 'category', 'q']
+
+    def search(self, queryset, name, value):
+        return search.filter_queryset(queryset, value)
+
+
+class CommentFilter(filters.FilterSet):
+    product_id = filters.NumberFilter(field_name='product_id', lookup_expr='exact')
+
+    class Meta:
+        model = Comment
+        fields = ['product_id']
+
+
+class ReplyFilter(filters.FilterSet):
+    comment_id = filters.NumberFilter(field_name='comment_id', lookup_expr='exact')
+
+    class Meta:
+        model = Reply
+        fields = ['comment_id']
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# Conflicts and throttling depend on state that can change, so a retry with the same key runs again.
+RETRYABLE_STATUSES = {status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS}
+
+
+def make_key(method, path, key):
+    return hashlib.sha1(f'{method}:{path}:{key}'.encode()).hexdigest()
+
+
+def fingerprint(data):
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def replay(record, request):
+    if record.fingerprint != fingerprint(request.data):
+        return Response({'error': f'{HEADER} was already used with a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    response = Response(record.response, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def get_lock_expiry():
+    return timezone.now() + timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 30))
+
+
+def claim(user, key, request_fingerprint):
+    now = timezone.now()
+    expired = now - timedelta(seconds=getattr(settings, 'IDEMPOTENCY_TIMEOUT', 60 * 60 * 24))
+    IdempotencyKey.objects.filter(user=user, created_at__lt=expired).delete()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(user=user, key=key, fingerprint=request_fingerprint,
+                                          locked_until=get_lock_expiry())
+        return True
+    except IntegrityError:
+        pass
+    return bool(IdempotencyKey.objects.filter(user=user, key=key, status_code__isnull=True, locked_until__lt=now)
+                .update(fingerprint=request_fingerprint, locked_until=get_lock_expiry(), created_at=now))
+
+
+def wait_for(user, key):
+    deadline = time.monotonic() + getattr(settings, 'IDEMPOTENCY_WAIT', 10)
+    while True:
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None or record.status_code is not None or record.locked_until < timezone.now():
+            return record
+        if time.monotonic() >= deadline:
+            raise TimeoutError
+        time.sleep(getattr(settings, 'IDEMPOTENCY_POLL_INTERVAL', 0.05))
+
+
+def run_idempotent(handler, request, *args, **kwargs):
+    idempotency_key = request.headers.get(HEADER)
+    if idempotency_key is None:
+        return handler(request, *args, **kwargs)
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        return Response({'error': f'{HEADER} must be 1-{MAX_KEY_LENGTH} characters'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    key = make_key(request.method, request.path, idempotency_key)
+    request_fingerprint = fingerprint(request.data)
+    while not claim(request.user, key, request_fingerprint):
+        try:
+            record = wait_for(request.user, key)
+        except TimeoutError:
+            return Response({'error': f'A request with this {HEADER} is still in progress'},
+                            status=status.HTTP_409_CONFLICT)
+        if record is not None and record.status_code is not None:
+            return replay(record, request)
+
+    records = IdempotencyKey.objects.filter(user=request.user, key=key)
+    try:
+        response = handler(request, *args, **kwargs)
+    except BaseException:
+        records.delete()
+        raise
+    if response.status_code < 500 and response.status_code not in RETRYABLE_STATUSES and hasattr(response, 'data'):
+        records.update(status_code=response.status_code, response=response.data, locked_until=None)
+    else:
+        records.delete()
+    return response
+
+
+def idempotent(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return run_idempotent(view, request, *args, **kwargs)
+
+    return wrapper
+
+
+class IdempotencyMixin:
+    def create(self, request, *args, **kwargs):
+        return run_idempotent(super().create, request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        return run_idempotent(super().update, request, *args, **kwargs)
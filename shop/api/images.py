@@ -0,0 +1,112 @@
+import hashlib
+import os
+from functools import cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.urls import reverse
+from django.utils.encoding import filepath_to_uri
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Product
+
+VARIANT_FORMAT = 'WEBP'
+VARIANT_QUALITY = 80
+VERSION_LENGTH = 16
+ORIGINAL_QUALITY = 90
+INVALID_IMAGE_ERRORS = (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError, FileNotFoundError)
+
+
+def get_storage():
+    return Product._meta.get_field('image').storage
+
+
+def get_sizes():
+    return tuple(getattr(settings, 'IMAGE_VARIANT_SIZES', (128, 256, 512)))
+
+
+@cache
+def get_variant_prefix():
+    return reverse('image-variant', args=[0, 'name']).removesuffix('0/name')
+
+
+def make_variant_urls(request):
+    base_url = get_variant_prefix()
+    if request is not None:
+        base_url = request.build_absolute_uri(base_url)
+    sizes = get_sizes()
+
+    def variant_urls(name):
+        if not name:
+            return None
+        path = filepath_to_uri(name).lstrip('/')
+        version = get_version(name)
+        query = f'?v={version}' if version else ''
+        return {str(size): f'{base_url}{size}/{path}{query}' for size in sizes}
+
+    return variant_urls
+
+
+def get_digest(name):
+    storage = get_storage()
+    try:
+        version = storage.get_modified_time(name).timestamp()
+    except NotImplementedError:
+        version = None
+    key = f'image-digest:{hashlib.sha1(name.encode()).hexdigest()}:{version}'
+    digest = caches['default'].get(key)
+    if digest is None:
+        with storage.open(name) as source:
+            digest = hashlib.file_digest(source, 'sha256').hexdigest()
+        caches['default'].set(key, digest, None)
+    return digest
+
+
+def get_version(name):
+    try:
+        return get_digest(name)[:VERSION_LENGTH]
+    except OSError:
+        return None
+
+
+def get_variant_name(digest, size):
+    return f'variants/{digest[:2]}/{digest}-{size}.webp'
+
+
+def render_variant(name, size):
+    with get_storage().open(name) as source, Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, VARIANT_FORMAT, quality=VARIANT_QUALITY)
+    return buffer.getvalue()
+
+
+def reencode(name):
+    storage = get_storage()
+    with storage.open(name) as source, Image.open(source) as image:
+        image.verify()
+        if image.format == VARIANT_FORMAT:
+            return name
+    with storage.open(name) as source, Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        buffer = BytesIO()
+        image.save(buffer, VARIANT_FORMAT, quality=ORIGINAL_QUALITY)
+    return storage.save(f'{os.path.splitext(name)[0]}.webp', ContentFile(buffer.getvalue()))
+
+
+def get_variant(name, size):
+    storage = get_storage()
+    digest = get_digest(name)
+    variant_name = get_variant_name(digest, size)
+    if not storage.exists(variant_name):
+        saved_name = storage.save(variant_name, ContentFile(render_variant(name, size)))
+        if saved_name != variant_name:
+            storage.delete(saved_name)
+    return variant_name, digest
+
+
+def generate_variants(name):
+    return [get_variant(name, size)[0] for size in get_sizes()]
@@ -0,0 +1,175 @@
+import functools
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+BUCKET_RATIO = 1.05
+METRICS = ('total_ms', 'db_ms', 'queries', 'serialize_ms', 'render_ms', 'size')
+PERCENTILES = (50, 95, 99)
+
+current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.templates = Counter()
+        self.timers = Counter()
+        self.active = set()
+        self.size = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def get_n_plus_one(self):
+        threshold = getattr(settings, 'INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 10)
+        return [(sql, count) for sql, count in self.templates.most_common() if count > threshold]
+
+    def server_timing(self):
+        entries = [f'db;dur={self.timers["db"] * 1000:.1f};desc="{self.queries} queries"']
+        entries += [f'{name};dur={self.timers[name] * 1000:.1f}' for name in ('serialize', 'render')]
+        entries.append(f'total;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(entries)
+
+    def values(self):
+        return {'total_ms': self.elapsed() * 1000, 'db_ms': self.timers['db'] * 1000, 'queries': self.queries,
+                'serialize_ms': self.timers['serialize'] * 1000, 'render_ms': self.timers['render'] * 1000,
+                'size': self.size}
+
+
+def measure(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = current.get()
+            if metrics is None or name in metrics.active:
+                return func(*args, **kwargs)
+            metrics.active.add(name)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.timers[name] += time.perf_counter() - start
+                metrics.active.discard(name)
+
+        return wrapper
+
+    return decorator
+
+
+class MeasuredSerializerMixin:
+    @measure('serialize')
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.timers['db'] += time.perf_counter() - start
+        metrics.queries += 1
+        metrics.templates[IN_LIST.sub('(...)', sql)] += 1
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def install():
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(install_query_wrapper, dispatch_uid='api.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        install_query_wrapper(None, connection)
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = Counter()
+        self.zeros = 0
+        self.count = 0
+        self.max = 0
+
+    def add(self, value):
+        self.count += 1
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.zeros += 1
+        else:
+            self.buckets[math.floor(math.log(value, BUCKET_RATIO))] += 1
+
+    def percentile(self, percent):
+        rank = math.ceil(percent / 100 * self.count)
+        if rank <= self.zeros:
+            return 0
+        seen = self.zeros
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(BUCKET_RATIO ** (index + 1), self.max)
+        return self.max
+
+    def summary(self):
+        summary = {f'p{percent}': round(self.percentile(percent), 2) for percent in PERCENTILES}
+        summary['max'] = round(self.max, 2)
+        return summary
+
+
+class Registry:
+    def __init__(self):
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def record(self, route, values, n_plus_one):
+        with self.lock:
+            stats = self.routes.setdefault(route, {'count': 0, 'n_plus_one': 0,
+                                                   **{metric: Histogram() for metric in METRICS}})
+            stats['count'] += 1
+            stats['n_plus_one'] += bool(n_plus_one)
+            for metric in METRICS:
+                stats[metric].add(values[metric])
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                route: {key: value.summary() if isinstance(value, Histogram) else value
+                        for key, value in stats.items()}
+                for route, stats in sorted(self.routes.items())
+            }
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+
+
+registry = Registry()
+
+
+def get_route(request):
+    match = getattr(request, 'resolver_match', None)
+    return f'{request.method} {match.view_name if match else "<unresolved>"}'
+
+
+def finish(request, metrics):
+    n_plus_one = metrics.get_n_plus_one()
+    for sql, count in n_plus_one:
+        logger.warning('Possible N+1 in %s %s: the same query ran %s times: %s',
+                       request.method, request.path, count, sql[:300])
+    registry.record(get_route(request), metrics.values(), n_plus_one)
@@ -0,0 +1,31 @@
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Product
+
+RESERVE_BATCH_SIZE = 300
+
+
+class OutOfStock(Exception):
+    def __init__(self, requested):
+        super().__init__('Insufficient stock')
+        self.requested = requested
+
+    def shortages(self):
+        available = dict(Product.objects.filter(pk__in=self.requested).values_list('id', 'stock'))
+        return [
+            {'product_id': product_id, 'requested': quantity, 'available': available.get(product_id, 0)}
+            for product_id, quantity in self.requested.items()
+            if available.get(product_id, 0) < quantity
+        ]
+
+
+# Must run inside transaction.atomic() so an earlier batch is rolled back when a later one falls short.
+def reserve(requested):
+    product_ids = list(requested)
+    for start in range(0, len(product_ids), RESERVE_BATCH_SIZE):
+        batch = product_ids[start:start + RESERVE_BATCH_SIZE]
+        quantity = Case(*(When(pk=product_id, then=Value(requested[product_id])) for product_id in batch),
+                        output_field=IntegerField())
+        reserved = Product.objects.filter(pk__in=batch, stock__gte=quantity).update(stock=F('stock') - quantity)
+        if reserved != len(batch):
+            raise OutOfStock(requested)
@@ -0,0 +1,155 @@
+import logging
+import os
+import random
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import images
+from .cache import bump_generation
+from .models import ImageJob, Product
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_mode():
+    return getattr(settings, 'IMAGE_JOBS_MODE', 'thread')
+
+
+def get_backoff(attempts):
+    base = getattr(settings, 'IMAGE_JOBS_BACKOFF', 5)
+    delay = min(base * 2 ** (attempts - 1), getattr(settings, 'IMAGE_JOBS_MAX_BACKOFF', 60 * 60))
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def get_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}'
+
+
+def enqueue(product):
+    job = ImageJob.objects.create(product=product, source=product.image.name)
+    mode = get_mode()
+    if mode == 'eager':
+        execute(claim(get_worker_id(), job.pk))
+    elif mode == 'thread':
+        transaction.on_commit(lambda: get_pool().notify())
+    return job
+
+
+def get_claimable(now):
+    stale = now - timedelta(seconds=getattr(settings, 'IMAGE_JOBS_LOCK_TIMEOUT', 60 * 10))
+    return Q(status=ImageJob.PENDING, run_after__lte=now) | Q(status=ImageJob.RUNNING, locked_at__lt=stale)
+
+
+def claim(worker_id, pk=None):
+    now = timezone.now()
+    claimable = ImageJob.objects.filter(get_claimable(now))
+    candidates = [pk] if pk is not None else claimable.order_by('run_after', 'id').values_list('id', flat=True)[:10]
+    for candidate in candidates:
+        claimed = claimable.filter(pk=candidate).update(
+            status=ImageJob.RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return ImageJob.objects.get(pk=candidate)
+    return None
+
+
+def process(job):
+    name = images.reencode(job.source)
+    if name != job.source:
+        if Product.objects.filter(pk=job.product_id, image=job.source).update(image=name):
+            transaction.on_commit(bump_generation)
+    images.generate_variants(name)
+    return name
+
+
+def execute(job):
+    if job is None:
+        return None
+    try:
+        job.result = process(job)
+    except images.INVALID_IMAGE_ERRORS as exc:
+        finish(job, ImageJob.FAILED, exc)
+    except Exception as exc:
+        if job.attempts >= getattr(settings, 'IMAGE_JOBS_MAX_ATTEMPTS', 5):
+            finish(job, ImageJob.FAILED, exc)
+        else:
+            logger.warning('Image job %s failed (attempt %s), retrying: %r', job.pk, job.attempts, exc)
+            job.status, job.last_error = ImageJob.PENDING, repr(exc)
+            job.run_after = timezone.now() + get_backoff(job.attempts)
+            job.locked_by, job.locked_at = '', None
+            job.save(update_fields=['status', 'last_error', 'run_after', 'locked_by', 'locked_at'])
+    else:
+        finish(job, ImageJob.DONE)
+    return job
+
+
+def finish(job, status, exc=None):
+    if exc is not None:
+        logger.error('Image job %s for %s failed: %r', job.pk, job.source, exc)
+        job.last_error = repr(exc)
+    job.status, job.finished_at = status, timezone.now()
+    job.locked_by, job.locked_at = '', None
+    job.save(update_fields=['status', 'result', 'last_error', 'finished_at', 'locked_by', 'locked_at'])
+
+
+def run_next(worker_id=None):
+    return execute(claim(worker_id or get_worker_id()))
+
+
+class WorkerPool:
+    def __init__(self, workers, poll_interval):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self.run, name=f'image-worker-{number}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def notify(self):
+        self.wakeup.set()
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def run(self):
+        worker_id = get_worker_id()
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    job = run_next(worker_id)
+                except Exception:
+                    logger.exception('Image worker %s could not fetch a job', worker_id)
+                    job = None
+                if job is None:
+                    self.wakeup.wait(self.poll_interval)
+                    self.wakeup.clear()
+        finally:
+            close_old_connections()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool(getattr(settings, 'IMAGE_JOBS_WORKERS', 2),
+                               getattr(settings, 'IMAGE_JOBS_POLL_INTERVAL', 5)).start()
+    return _pool
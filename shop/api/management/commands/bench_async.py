@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from api.models import Category, Comment, Product, User
+
+
+class Command(BaseCommand):
+    help = 'Compare requests/sec of the sync and async read endpoints under concurrent load in a test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+                       THROTTLE_SCOPES={})
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            product = self.seed(options['products'])
+            for label, prefix in (('sync', ''), ('async', 'async-')):
+                urls = [
+                    reverse(prefix + 'product-list') + '?ordering=price&price_gt=10',
+                    reverse(prefix + 'product-detail', args=[product.id]),
+                    reverse(prefix + 'category-list'),
+                    reverse(prefix + 'comment-list') + f'?product_id={product.id}',
+                ]
+                elapsed = asyncio.run(self.load(urls, options['requests'], options['concurrency']))
+                self.stdout.write(f'{label:>5}: {options["requests"] / elapsed:8.1f} req/s '
+                                  f'({options["requests"]} requests, concurrency {options["concurrency"]})')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    @staticmethod
+    def seed(count):
+        user = User.objects.create(username='bench')
+        category = Category.objects.create(name='Bench')
+        Product.objects.bulk_create([
+            Product(name=f'Product {i}', description=f'Description {i}', price=i % 500, category=category)
+            for i in range(count)
+        ])
+        product = Product.objects.first()
+        Comment.objects.bulk_create([Comment(user=user, product=product, text=f'Comment {i}') for i in range(50)])
+        return product
+
+    @staticmethod
+    async def load(urls, requests, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(url):
+            async with semaphore:
+                response = await client.get(url)
+                if response.streaming:
+                    async for _ in response:
+                        pass
+                assert response.status_code == 200, (url, response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(fetch(urls[i % len(urls)]) for i in range(requests)))
+        return time.perf_counter() - start
@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.test import APIRequestFactory
+
+from api.models import Category, Product
+from api.price_index import index
+from api.views import ProductViewSet
+
+QUERIES = (
+    ('category + range', {'category': 1, 'price_gt': 1000, 'price_lt': 9000, 'ordering': 'price'}),
+    ('range, descending', {'price_gt': 5000, 'ordering': '-price'}),
+    ('full catalog', {'ordering': 'price'}),
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare the in-process price index with the ORM path for price-sorted product pages in a test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                       CATALOG_CACHE='default', CATALOG_CACHE_TIMEOUT=0, THROTTLE_SCOPES={},
+                       CATALOG_PRICE_INDEX_MODE='eager')
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        view = ProductViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        try:
+            seeded = 0
+            for size in sorted(options['sizes']):
+                self.seed(seeded, size, options['categories'])
+                seeded = size
+                index.invalidate()
+                start = time.perf_counter()
+                index.ensure_current()
+                self.stdout.write(f'{size:>9} products: index built in {(time.perf_counter() - start) * 1000:.0f} ms')
+
+                for label, params in QUERIES:
+                    timings = {}
+                    for path, enabled in (('orm', False), ('index', True)):
+                        with override_settings(CATALOG_PRICE_INDEX=enabled):
+                            first = self.measure(lambda: view(factory.get('/api/products/', params)),
+                                                 options['repeat'])
+                            cursor = view(factory.get('/api/products/', params)).data['next']
+                            deep = self.measure(lambda: view(factory.get(cursor)), options['repeat'])
+                        timings[path] = first, deep
+                    (orm_first, orm_deep), (index_first, index_deep) = timings['orm'], timings['index']
+                    self.stdout.write(f'  {label:>18}: first page orm {orm_first * 1000:7.2f} ms, '
+                                      f'index {index_first * 1000:7.2f} ms ({orm_first / index_first:5.1f}x); '
+                                      f'next page orm {orm_deep * 1000:7.2f} ms, '
+                                      f'index {index_deep * 1000:7.2f} ms ({orm_deep / index_deep:5.1f}x)')
+        finally:
+            index.reset()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    @staticmethod
+    def seed(start, stop, categories):
+        if not Category.objects.exists():
+            Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(categories)])
+        category_ids = list(Category.objects.values_list('id', flat=True))
+        for offset in range(start, stop, 50_000):
+            Product.objects.bulk_create([
+                Product(name=f'Product {i}', description=f'Description {i}', price=i * 7919 % 10_000,
+                        category_id=category_ids[i % len(category_ids)])
+                for i in range(offset, min(offset + 50_000, stop))
+            ])
+
+    @staticmethod
+    def measure(func, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.test import APIRequestFactory
+
+from api import search
+from api.models import Category, Product
+from api.views import ProductViewSet
+
+BRANDS = ('Samsung', 'Apple', 'Xiaomi', 'Bosch', 'LG', 'Philips', 'Motorola', 'Gorenje')
+KINDS = ('Мобільний телефон', 'Холодильник', "М'яч футбольний", 'Пральна машина', 'Ноутбук', 'Навушники')
+COLOURS = ('Black', 'Light Green', 'Titanium Gray', 'Білий', 'Сріблястий', 'Синій')
+QUERIES = ('телефон', 'холод', 'samsung galax', 'ноутбук xiaomi 17', 'pro max 4242')
+
+
+class Command(BaseCommand):
+    help = 'Measure ?q= product search latency over a generated multilingual catalog in a test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    @override_settings(CATALOG_CACHE_TIMEOUT=0, THROTTLE_SCOPES={})
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        view = ProductViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        try:
+            self.seed(options['products'])
+            start = time.perf_counter()
+            search.rebuild(DEFAULT_DB_ALIAS)
+            self.stdout.write(f'{options["products"]} products: index rebuilt in '
+                              f'{(time.perf_counter() - start) * 1000:.0f} ms')
+            for q in QUERIES:
+                matches = search.filter_queryset(Product.objects.all(), q).count()
+                best = self.measure(lambda: view(factory.get('/api/products/', {'q': q})), options['repeat'])
+                self.stdout.write(f'  {q!r:>22}: {best * 1000:7.2f} ms per first page, {matches} matches')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    @staticmethod
+    def seed(count):
+        category = Category.objects.create(name='Bench')
+        for offset in range(0, count, 50_000):
+            Product.objects.bulk_create([
+                Product(name=f'{KINDS[i % len(KINDS)]} {BRANDS[i % len(BRANDS)]} '
+                             f'{"Galaxy" if i % 3 else "Pro Max"} {i % 97} {COLOURS[i % len(COLOURS)]}'[:40],
+                        description=f'Екран 6.{i % 9}" / RAM {i % 16} ГБ / {i} вбудованої пам\'яті',
+                        price=i % 10_000, category=category)
+                for i in range(offset, min(offset + 50_000, count))
+            ])
+
+    @staticmethod
+    def measure(func, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import Category, Order, OrderProduct, Product, User
+from api.serializers import OrderSerializer, ProductSerializer
+from api.values_serializers import OrderValuesSerializer, ProductValuesSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare ModelSerializer and values() serializer time per 1k rows in a test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            self.seed(options['rows'])
+            context = {'request': Request(APIRequestFactory().get('/api/products/'))}
+            renderer = JSONRenderer()
+            for label, serializer, values_serializer, queryset in (
+                ('products', ProductSerializer, ProductValuesSerializer, Product.objects.all()),
+                ('orders', OrderSerializer, OrderValuesSerializer, Order.objects.prefetch_related('products__product')),
+            ):
+                drf = self.measure(lambda: renderer.render(
+                    serializer(queryset.all(), many=True, context=context).data), options['repeat'])
+                fast = self.measure(lambda: renderer.render(
+                    values_serializer(values_serializer.get_queryset(queryset.all()), many=True, context=context).data
+                ), options['repeat'])
+                per_1k = 1000 / options['rows'] * 1000
+                self.stdout.write(f'{label:>8}: serializer {drf * per_1k:7.2f} ms/1k rows, '
+                                  f'values {fast * per_1k:7.2f} ms/1k rows, {drf / fast:4.1f}x')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    @staticmethod
+    def seed(rows):
+        user = User.objects.create(username='bench')
+        category = Category.objects.create(name='Bench')
+        products = Product.objects.bulk_create([
+            Product(name=f'Product {i}', description=f'Description {i}', price=i, category=category,
+                    image=f'product-{i}.webp')
+            for i in range(rows)
+        ])
+        orders = Order.objects.bulk_create([Order(user=user, total_price=i) for i in range(rows)])
+        OrderProduct.objects.bulk_create([
+            OrderProduct(order=order, product=product, quantity=1, price=product.price)
+            for order, product in zip(orders, products)
+        ])
+
+    @staticmethod
+    def measure(func, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
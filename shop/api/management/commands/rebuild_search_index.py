@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from api import search
+from api.cache import bump_generation
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index after writes that skip model signals, e.g. bulk imports.'
+
+    def handle(self, *args, **options):
+        if not search.has_fts5(DEFAULT_DB_ALIAS):
+            raise CommandError('The search index needs SQLite with FTS5; other databases search with icontains.')
+        with transaction.atomic():
+            if not search.create_index(DEFAULT_DB_ALIAS):
+                search.rebuild(DEFAULT_DB_ALIAS)
+            transaction.on_commit(bump_generation)
+        self.stdout.write('Rebuilt the product search index.')
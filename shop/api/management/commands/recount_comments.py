@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from api.cache import bump_generation
+from api.models import Comment, Product, Reply, newest_comment_fields
+
+
+def count_of(model, field):
+    return Coalesce(Subquery(
+        model.objects
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('id'))
+        .values('count')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = ('Recompute Product.comment_count, the latest-comment summary and Comment.reply_count from the comment '
+            'and reply tables.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            products = Product.objects.update(comment_count=count_of(Comment, 'product'),
+                                               **newest_comment_fields())
+            comments = Comment.objects.update(reply_count=count_of(Reply, 'comment'))
+            transaction.on_commit(bump_generation)
+        self.stdout.write(f'Recounted comments for {products} products and replies for {comments} comments.')
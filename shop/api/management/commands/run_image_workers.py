@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = ('Process queued product image jobs. Run one or more of these with IMAGE_JOBS_MODE = "external" '
+            'to keep image work out of the web processes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'IMAGE_JOBS_WORKERS', 2))
+        parser.add_argument('--poll-interval', type=float,
+                            default=getattr(settings, 'IMAGE_JOBS_POLL_INTERVAL', 5))
+        parser.add_argument('--once', action='store_true', help='Drain the jobs that are due and exit.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = 0
+            while (job := jobs.run_next()) is not None:
+                processed += 1
+                self.stdout.write(f'Job {job.pk} ({job.source}): {job.status}')
+            self.stdout.write(f'Processed {processed} image jobs.')
+            return
+
+        pool = jobs.WorkerPool(options['workers'], options['poll_interval']).start()
+        self.stdout.write(f'Started {options["workers"]} image workers.')
+        try:
+            while any(thread.is_alive() for thread in pool.threads):
+                pool.stopping.wait(1)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping image workers.')
+        finally:
+            pool.stop()
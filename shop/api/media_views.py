@@ -0,0 +1,148 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from . import images
+from .models import Product
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class UnsatisfiableRange(Exception):
+    pass
+
+
+class RangeFile:
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        if not int(end):
+            raise UnsatisfiableRange
+        return max(size - int(end), 0), size - 1
+    start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise UnsatisfiableRange
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if if_range is None:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def serve_file(request, name, etag=None, max_age=None, immutable=False):
+    storage = images.get_storage()
+    try:
+        path = storage.path(name)
+        stat = os.stat(path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('No such media file.')
+    if not os.path.isfile(path):
+        raise Http404('No such media file.')
+
+    last_modified = int(stat.st_mtime)
+    etag = etag or quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_response(request, name, path, stat.st_size, etag, last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    if response.status_code in (200, 206, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, public=True, immutable=immutable,
+                            max_age=getattr(settings, 'MEDIA_MAX_AGE', 60 * 60 * 24) if max_age is None else max_age)
+    return response
+
+
+def build_response(request, name, path, size, etag, last_modified):
+    sendfile = getattr(settings, 'MEDIA_SENDFILE', None)
+    if sendfile == 'x-accel-redirect':
+        response = HttpResponse(content_type=None)
+        response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/') + quote(name)
+        del response['Content-Type']
+        return response
+    if sendfile == 'x-sendfile':
+        response = HttpResponse(content_type=None)
+        response['X-Sendfile'] = path
+        del response['Content-Type']
+        return response
+
+    byte_range = None
+    if 'Range' in request.headers and if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers['Range'], size)
+        except UnsatisfiableRange:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        response['Content-Length'] = size
+        return response
+    if byte_range is None:
+        return FileResponse(open(path, 'rb'))
+
+    start, end = byte_range
+    response = FileResponse(RangeFile(open(path, 'rb'), start, end - start + 1), status=206)
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    return serve_file(request, path)
+
+
+@require_safe
+def image_variant(request, size, name):
+    if (size not in images.get_sizes() or not Product.objects.filter(image=name).exists()
+            or not images.get_storage().exists(name)):
+        raise Http404('No such image variant.')
+    try:
+        variant_name, digest = images.get_variant(name, size)
+    except OSError:
+        raise Http404('The source file is not a readable image.')
+    version = digest[:images.VERSION_LENGTH]
+    if request.GET.get('v') != version:
+        response = HttpResponseRedirect(f'{request.path}?v={version}')
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'IMAGE_VARIANT_REDIRECT_MAX_AGE', 60))
+        return response
+    return serve_file(request, variant_name, etag=quote_etag(f'{digest}-{size}'), immutable=True,
+                      max_age=getattr(settings, 'IMAGE_VARIANT_MAX_AGE', 60 * 60 * 24 * 365))
@@ -0,0 +1,139 @@
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import FileResponse, JsonResponse
+
+from . import instrumentation
+
+
+class AdmissionControlMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def admit(self):
+        limit = getattr(settings, 'ADMISSION_MAX_IN_FLIGHT', None)
+        with self.lock:
+            if limit is not None and self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def reject(self):
+        response = JsonResponse({'error': 'Server is busy, try again later'}, status=503)
+        response['Retry-After'] = getattr(settings, 'ADMISSION_RETRY_AFTER', 1)
+        return response
+
+    def finish(self, response):
+        if response.streaming:
+            response._resource_closers.append(self.release)
+        else:
+            self.release()
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.admit():
+            return self.reject()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self.release()
+            raise
+        return self.finish(response)
+
+    async def __acall__(self, request):
+        if not self.admit():
+            return self.reject()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            self.release()
+            raise
+        return self.finish(response)
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            return self.get_response(request)
+        metrics = instrumentation.RequestMetrics()
+        token = instrumentation.current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            return await self.get_response(request)
+        metrics = instrumentation.RequestMetrics()
+        token = instrumentation.current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        metrics = instrumentation.current.get()
+        if metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                metrics.timers['render'] += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, metrics):
+        if getattr(settings, 'INSTRUMENTATION_SERVER_TIMING', True):
+            response['Server-Timing'] = metrics.server_timing()
+        if not response.streaming:
+            metrics.size = len(response.content)
+            instrumentation.finish(request, metrics)
+            return response
+        if isinstance(response, FileResponse):
+            metrics.size = int(response.get('Content-Length', 0))
+        elif not response.is_async:
+            response.streaming_content = self.stream(response.streaming_content, metrics)
+        response._resource_closers.append(lambda: instrumentation.finish(request, metrics))
+        return response
+
+    @staticmethod
+    def stream(content, metrics):
+        iterator = iter(content)
+        while True:
+            token = instrumentation.current.set(metrics)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                instrumentation.current.reset(token)
+            metrics.size += len(chunk)
+            yield chunk
@@ -0,0 +1,140 @@
+import calendar
+import hashlib
+from itertools import islice
+
+from django.core.exceptions import FieldDoesNotExist
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+
+def request_fingerprint(request, view):
+    params = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+    fingerprint = repr((view.basename, view.action, sorted(view.kwargs.items()), params,
+                        request.accepted_renderer.format))
+    return hashlib.sha1(fingerprint.encode()).hexdigest()
+
+
+def plan_related(serializer, prefix='', prefetching=False):
+    select_related, prefetch_related = [], []
+    if not isinstance(serializer, serializers.ModelSerializer):
+        return select_related, prefetch_related
+    model = serializer.Meta.model
+    for field in serializer.fields.values():
+        if field.write_only or len(field.source_attrs) != 1:
+            continue
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if not isinstance(nested, serializers.ModelSerializer):
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+
+        path = prefix + field.source
+        many = model_field.one_to_many or model_field.many_to_many
+        if many or prefetching:
+            prefetch_related.append(path)
+        else:
+            select_related.append(path)
+
+        nested_select, nested_prefetch = plan_related(nested, path + '__', prefetching or many)
+        select_related += nested_select
+        prefetch_related += nested_prefetch
+    return select_related, prefetch_related
+
+
+class QuerysetPlanningMixin:
+    _plans = {}
+
+    def get_queryset_plan(self):
+        serializer_class = self.get_serializer_class()
+        if serializer_class not in self._plans:
+            self._plans[serializer_class] = plan_related(serializer_class())
+        return self._plans[serializer_class]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        select_related, prefetch_related = self.get_queryset_plan()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
+class ConditionalGetMixin:
+    def get_validators(self):
+        raise NotImplementedError('`get_validators()` must return a (version, last_modified) pair.')
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    def conditional(self, handler, request, *args, **kwargs):
+        version, last_modified = self.get_validators()
+        etag = quote_etag(hashlib.sha1(f'{version}:{request_fingerprint(request, self)}'.encode()).hexdigest())
+        timestamp = last_modified and calendar.timegm(last_modified.utctimetuple())
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class StreamingListMixin:
+    stream_query_param = 'stream'
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        mode = request.query_params.get(self.stream_query_param)
+        if mode not in ('1', 'true', 'ndjson'):
+            return super().list(request, *args, **kwargs)
+
+        rows = self.filter_queryset(self.get_queryset()).iterator(chunk_size=self.stream_chunk_size)
+        renderer = JSONRenderer()
+
+        def serialized():
+            while chunk := list(islice(rows, self.stream_chunk_size)):
+                for item in self.get_serializer(chunk, many=True).data:
+                    yield renderer.render(item)
+
+        if mode == 'ndjson':
+            return StreamingHttpResponse((item + b'\n' for item in serialized()),
+                                         content_type='application/x-ndjson')
+
+        def json_array():
+            yield b'['
+            for index, item in enumerate(serialized()):
+                yield item if index == 0 else b',' + item
+            yield b']'
+
+        return StreamingHttpResponse(json_array(), content_type='application/json')
+
+
+class ValuesReadMixin:
+    values_serializer_class = None
+    values_actions = ('list', 'retrieve')
+
+    def use_values(self):
+        return self.action in self.values_actions and not getattr(self, 'swagger_fake_view', False)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.use_values():
+            return self.values_serializer_class.get_queryset(queryset.prefetch_related(None))
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.use_values():
+            kwargs.setdefault('context', self.get_serializer_context())
+            return self.values_serializer_class(*args, **kwargs)
+        return super().get_serializer(*args, **kwargs)
@@ -1,10 +1,17 @@
 from django.contrib.auth.models import AbstractUser
 from django.db.models import *
+from django.db.models.functions import Coalesce, Left
+from django.utils import timezone
+
+from .fields import SearchDocumentField
+
+LATEST_COMMENT_LENGTH = 100
 
 
 class Category(Model):
     name = CharField(max_length=40)
     description = CharField(max_length=255, null=True, blank=True)
+    updated_at = DateTimeField(auto_now=True, null=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -16,11 +23,38 @@ class Product(Model):
     price = IntegerField()
     category = ForeignKey(Category, on_delete=CASCADE)
     image = ImageField(default=None, null=True, blank=True)
+    updated_at = DateTimeField(auto_now=True, null=True, db_index=True)
+    comment_count = IntegerField(default=0)
+    # Copied from the newest comment alongside comment_count so product reads need no join.
+    latest_comment = ForeignKey('Comment', null=True, blank=True, related_name='+', on_delete=SET_NULL)
+    latest_comment_text = CharField(max_length=LATEST_COMMENT_LENGTH, default='', blank=True)
+    latest_comment_at = DateTimeField(null=True, blank=True)
+    stock = PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            Index(fields=['price'], name='product_price_idx'),
+            Index(fields=['category', 'price'], name='product_category_price_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+# Backed by an FTS5 virtual table that api.search creates after migrate.
+class ProductSearch(Model):
+    product = OneToOneField(Product, primary_key=True, db_column='rowid', related_name='search',
+                            on_delete=DO_NOTHING)
+    name = TextField()
+    description = TextField()
+    document = SearchDocumentField(db_column='api_product_search')
+    rank = FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'api_product_search'
+
+
 class User(AbstractUser):
     pass
 
@@ -30,6 +64,9 @@ class CartUserProduct(Model):
     product = ForeignKey(Product, on_delete=CASCADE)
     quantity = IntegerField(default=1)
 
+    class Meta:
+        unique_together = ('user', 'product')
+
 
 class Order(Model):
     user = ForeignKey(User, on_delete=CASCADE)
@@ -38,6 +75,9 @@ class Order(Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ]
 
 
 class OrderProduct(Model):
@@ -60,9 +100,30 @@ class Comment(Model):
     product = ForeignKey(Product, on_delete=CASCADE)
     text = TextField()
     created_at = DateTimeField(auto_now_add=True)
+    reply_count = IntegerField(default=0)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            Index(fields=['product', '-created_at'], name='comment_product_created_idx'),
+        ]
+
+
+def latest_comment_fields(comment):
+    return {'latest_comment': comment, 'latest_comment_text': comment.text[:LATEST_COMMENT_LENGTH],
+            'latest_comment_at': comment.created_at}
+
+
+# Update expressions that copy each product's newest comment, for deletes and recounts.
+def newest_comment_fields():
+    def newest(**field):
+        return Subquery(
+            Comment.objects.filter(product=OuterRef('pk')).order_by('-created_at', '-id').values(**field)[:1]
+        )
+
+    return {'latest_comment': newest(value=F('id')),
+            'latest_comment_text': Coalesce(newest(value=Left('text', LATEST_COMMENT_LENGTH)), Value('')),
+            'latest_comment_at': newest(value=F('created_at'))}
 
 
 class Reply(Model):
@@ -73,3 +134,46 @@ class Reply(Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            Index(fields=['comment', '-created_at'], name='reply_comment_created_idx'),
+        ]
+
+
+class ImageJob(Model):
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    product = ForeignKey(Product, on_delete=CASCADE, related_name='image_jobs')
+    source = CharField(max_length=255)
+    status = CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = PositiveIntegerField(default=0)
+    run_after = DateTimeField(default=timezone.now)
+    locked_by = CharField(max_length=100, blank=True, default='')
+    locked_at = DateTimeField(null=True, blank=True)
+    result = CharField(max_length=255, blank=True, default='')
+    last_error = TextField(blank=True, default='')
+    created_at = DateTimeField(auto_now_add=True)
+    finished_at = DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            Index(fields=['status', 'run_after'], name='imagejob_status_run_after_idx'),
+        ]
+
+
+class IdempotencyKey(Model):
+    user = ForeignKey(User, on_delete=CASCADE)
+    key = CharField(max_length=40)
+    fingerprint = CharField(max_length=40)
+    status_code = PositiveSmallIntegerField(null=True)
+    response = JSONField(null=True)
+    locked_until = DateTimeField(null=True)
+    created_at = DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['user', 'key'], name='idempotencykey_user_key_uniq'),
+        ]
+        indexes = [
+            Index(fields=['user', 'created_at'], name='idempotency_user_created_idx'),
+        ]
@@ -0,0 +1,252 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+
+from .cache import get_cache
+from .models import Product
+
+VERSION_KEY = 'catalog:price-index:version'
+INDEXED_FIELDS = {'price', 'category', 'category_id'}
+UNKNOWN = object()
+
+
+# Versions start from a timestamp so that a flushed cache never hands out a version an index already holds.
+def get_version():
+    return get_cache().get_or_set(VERSION_KEY, time.time_ns, timeout=None)
+
+
+def bump_version():
+    try:
+        return get_cache().incr(VERSION_KEY)
+    except ValueError:
+        return get_version()
+
+
+class PriceList:
+    def __init__(self):
+        self.prices = array('q')
+        self.ids = array('q')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, price, pk):
+        self.prices.append(price)
+        self.ids.append(pk)
+
+    def position(self, price, pk):
+        lo = bisect_left(self.prices, price)
+        hi = bisect_right(self.prices, price, lo)
+        return bisect_left(self.ids, pk, lo, hi)
+
+    def insert(self, price, pk):
+        position = self.position(price, pk)
+        self.prices.insert(position, price)
+        self.ids.insert(position, pk)
+
+    def remove(self, price, pk):
+        position = self.position(price, pk)
+        if position < len(self.ids) and self.ids[position] == pk:
+            del self.prices[position]
+            del self.ids[position]
+
+    def bounds(self, lower, upper):
+        start = 0 if lower is None else bisect_right(self.prices, lower)
+        stop = len(self.prices) if upper is None else bisect_left(self.prices, upper)
+        return start, max(start, stop)
+
+
+class PriceIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.built_at = None
+        self.building = False
+        self.products = PriceList()
+        self.categories = {}
+
+    def build(self):
+        version = get_version()
+        products, categories = PriceList(), defaultdict(PriceList)
+        rows = Product.objects.order_by('price', 'id').values_list('price', 'id', 'category_id')
+        for price, pk, category_id in rows.iterator(chunk_size=10000):
+            products.append(price, pk)
+            categories[category_id].append(price, pk)
+        with self.lock:
+            if get_version() != version:
+                return False
+            self.products, self.categories, self.version = products, dict(categories), version
+            self.built_at = time.monotonic()
+        return True
+
+    def build_in_background(self):
+        try:
+            self.build()
+        finally:
+            self.building = False
+            connection.close()
+
+    def start_build(self):
+        with self.lock:
+            if self.building:
+                return
+            self.building = True
+        threading.Thread(target=self.build_in_background, name='price-index', daemon=True).start()
+
+    def ensure_current(self):
+        current = get_version() == self.version
+        if current and time.monotonic() - self.built_at < getattr(settings, 'CATALOG_PRICE_INDEX_MAX_AGE', 60):
+            return True
+        if getattr(settings, 'CATALOG_PRICE_INDEX_MODE', 'thread') == 'eager':
+            with self.lock:
+                return self.build()
+        self.start_build()
+        return current
+
+    def reset(self):
+        with self.lock:
+            self.version = None
+
+    def invalidate(self):
+        bump_version()
+
+    def select(self, category, lower, upper, descending, start, stop):
+        with self.lock:
+            prices = self.products if category is None else self.categories.get(category, PriceList())
+            first, last = prices.bounds(lower, upper)
+            start, stop, _ = slice(start, stop).indices(last - first)
+            if descending:
+                first, last = last - stop, last - start
+                return list(zip(reversed(prices.ids[first:last]), reversed(prices.prices[first:last])))
+            return list(zip(prices.ids[first + start:first + stop], prices.prices[first + start:first + stop]))
+
+    def count(self, category, lower, upper, start, stop):
+        with self.lock:
+            prices = self.products if category is None else self.categories.get(category, PriceList())
+            first, last = prices.bounds(lower, upper)
+            return len(range(*slice(start, stop).indices(last - first)))
+
+    def remember(self, instance, update_fields=None):
+        if self.version is None or instance._state.adding:
+            return
+        if update_fields is not None and not INDEXED_FIELDS & set(update_fields):
+            return
+        entry = Product.objects.filter(pk=instance.pk).values_list('price', 'category_id').first()
+        instance._price_index_entry = entry
+
+    def saved(self, instance, created, update_fields=None):
+        if update_fields is not None and not INDEXED_FIELDS & set(update_fields):
+            return
+        previous = None if created else instance.__dict__.pop('_price_index_entry', UNKNOWN)
+        current = (instance.price, instance.category_id)
+        if previous != current:
+            self.apply(instance.pk, previous, current)
+
+    def deleted(self, instance):
+        self.apply(instance.pk, (instance.price, instance.category_id), None)
+
+    def apply(self, pk, previous, current):
+        version = bump_version()
+        with self.lock:
+            if self.version is None or version != self.version + 1 or previous is UNKNOWN:
+                self.version = None
+                return
+            if previous is not None:
+                price, category_id = previous
+                self.products.remove(price, pk)
+                self.categories.get(category_id, PriceList()).remove(price, pk)
+            if current is not None:
+                price, category_id = current
+                self.products.insert(price, pk)
+                self.categories.setdefault(category_id, PriceList()).insert(price, pk)
+            self.version = version
+
+
+class IndexedQuery:
+    def __init__(self, index, queryset, category=None, lower=None, upper=None, descending=False, start=0,
+                 stop=None):
+        self.index = index
+        self.queryset = queryset
+        self.model = queryset.model
+        self.category = category
+        self.lower = lower
+        self.upper = upper
+        self.descending = descending
+        self.start = start
+        self.stop = stop
+
+    def clone(self, **kwargs):
+        options = {
+            'category': self.category, 'lower': self.lower, 'upper': self.upper, 'descending': self.descending,
+            'start': self.start, 'stop': self.stop,
+        }
+        return IndexedQuery(self.index, self.queryset, **{**options, **kwargs})
+
+    def order_by(self, *ordering):
+        if not ordering:
+            return self
+        if ordering[0].lstrip('-') != 'price':
+            raise ValueError(f'The price index cannot be ordered by {ordering[0]!r}.')
+        return self.clone(descending=ordering[0].startswith('-'))
+
+    def filter(self, price__gt=None, price__lt=None):
+        lower, upper = self.lower, self.upper
+        if price__gt is not None:
+            lower = Decimal(price__gt) if lower is None else max(lower, Decimal(price__gt))
+        if price__lt is not None:
+            upper = Decimal(price__lt) if upper is None else min(upper, Decimal(price__lt))
+        return self.clone(lower=lower, upper=upper)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError('The price index only supports slicing.')
+        start = self.start + (key.start or 0)
+        stop = self.stop if key.stop is None else self.start + key.stop
+        if self.stop is not None and stop is not None:
+            stop = min(stop, self.stop)
+        return self.clone(start=start, stop=stop)
+
+    def __iter__(self):
+        return iter(self.hydrate())
+
+    def count(self):
+        return self.index.count(self.category, self.lower, self.upper, self.start, self.stop)
+
+    def hydrate(self):
+        entries = self.index.select(self.category, self.lower, self.upper, self.descending, self.start, self.stop)
+        rows = {row['id']: row for row in self.queryset.filter(pk__in=[pk for pk, _ in entries])}
+        for pk, price in entries:
+            row = rows.get(pk)
+            if row is None or row['price'] != price or self.category not in (None, row['category']):
+                self.index.reset()
+                return list(self.fallback())
+        return [rows[pk] for pk, _ in entries]
+
+    def fallback(self):
+        queryset = self.queryset
+        if self.category is not None:
+            queryset = queryset.filter(category=self.category)
+        if self.lower is not None:
+            queryset = queryset.filter(price__gt=self.lower)
+        if self.upper is not None:
+            queryset = queryset.filter(price__lt=self.upper)
+        ordering = ('-price', '-id') if self.descending else ('price', 'id')
+        return queryset.order_by(*ordering)[self.start:self.stop]
+
+
+index = PriceIndex()
+
+
+def query(queryset, price_gt=None, price_lt=None, category=None):
+    if category is not None and category != int(category):
+        return None
+    if not index.ensure_current():
+        return None
+    return IndexedQuery(index, queryset, category=None if category is None else int(category)).filter(
+        price__gt=price_gt, price__lt=price_lt)
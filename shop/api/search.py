@@ -0,0 +1,73 @@
+import re
+import sqlite3
+from contextlib import closing
+
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+
+from .models import Product, ProductSearch
+
+TABLE = ProductSearch._meta.db_table
+INDEXED_FIELDS = {'name', 'description'}
+TOKEN_PATTERN = re.compile(r'\w+')
+MAX_TERMS = 10
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_fts5 = {}
+
+
+def has_fts5(using):
+    if using not in _fts5:
+        available = False
+        if connections[using].vendor == 'sqlite':
+            with closing(sqlite3.connect(':memory:')) as probe:
+                available = ('ENABLE_FTS5',) in probe.execute('PRAGMA compile_options').fetchall()
+        _fts5[using] = available
+    return _fts5[using]
+
+
+def create_index(using):
+    if not has_fts5(using) or TABLE in connections[using].introspection.table_names():
+        return False
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"CREATE VIRTUAL TABLE {TABLE} USING fts5(name, description, "
+                       f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}, rank) VALUES ('rank', %s)",
+                       [f'bm25({NAME_WEIGHT}, {DESCRIPTION_WEIGHT})'])
+    rebuild(using)
+    return True
+
+
+def rebuild(using):
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(f"INSERT INTO {TABLE}(rowid, name, description) "
+                       f"SELECT id, name, COALESCE(description, '') FROM {Product._meta.db_table}")
+
+
+def index_product(product, using):
+    if has_fts5(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'INSERT OR REPLACE INTO {TABLE}(rowid, name, description) VALUES (%s, %s, %s)',
+                           [product.pk, product.name, product.description or ''])
+
+
+def remove_product(product, using):
+    if has_fts5(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [product.pk])
+
+
+def filter_queryset(queryset, value):
+    terms = TOKEN_PATTERN.findall(value)[:MAX_TERMS]
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+    if has_fts5(queryset.db):
+        expression = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(search__document__match=expression).annotate(search_rank=F('search__rank'))
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(description__icontains=term)
+    return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
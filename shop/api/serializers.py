@@ -1,12 +1,17 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
 
+from .cache import bump_generation
+from .images import make_variant_urls
+from .instrumentation import MeasuredSerializerMixin
 from .models import *
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     def create(self, validated_data):
@@ -21,29 +26,51 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'password']
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = '__all__'
+        exclude = ['updated_at']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+    latest_comment = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
-        fields = '__all__'
+        fields = ['id', 'name', 'description', 'price', 'image', 'image_variants', 'comment_count',
+                  'latest_comment', 'category']
+        read_only_fields = ['comment_count']
+
+    def get_image_variants(self, product):
+        return make_variant_urls(self.context.get('request'))(product.image.name)
 
+    def get_latest_comment(self, product):
+        if product.latest_comment_id is None:
+            return None
+        return {
+            'id': product.latest_comment_id,
+            'text': product.latest_comment_text,
+            'created_at': serializers.DateTimeField().to_representation(product.latest_comment_at),
+        }
 
-class CartUserProductSerializer(serializers.ModelSerializer):
+
+class CartUserProductSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     user_id = serializers.HiddenField(default=serializers.CurrentUserDefault())
     product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
     product = ProductSerializer(read_only=True)
 
     def create(self, validated_data):
-        cart_user_product = CartUserProduct.objects.create(
+        quantity = validated_data.get('quantity', 1)
+        cart_user_product, created = CartUserProduct.objects.get_or_create(
             user=validated_data['user_id'],
             product=validated_data['product_id'],
-            quantity=validated_data.get('quantity', 1)
+            defaults={'quantity': quantity}
         )
+        if not created:
+            cart_user_product.quantity = F('quantity') + quantity
+            cart_user_product.save(update_fields=['quantity'])
+            cart_user_product.refresh_from_db(fields=['quantity'])
         return cart_user_product
 
     def update(self, instance, validated_data):
@@ -62,7 +89,51 @@ class CartUserProductSerializer(serializers.ModelSerializer):
         fields = ['id', 'user_id', 'product_id', 'quantity', 'product']
 
 
-class OrderProductSerializer(serializers.ModelSerializer):
+class CartItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(default=1)
+
+    @staticmethod
+    def validate_quantity(value):
+        if value < 1:
+            raise serializers.ValidationError("Quantity must be at least 1")
+        return value
+
+
+class CartBulkSerializer(serializers.Serializer):
+    user_id = serializers.HiddenField(default=serializers.CurrentUserDefault())
+    items = CartItemSerializer(many=True, required=False)
+    remove = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    @staticmethod
+    def validate_items(value):
+        product_ids = [item['product_id'] for item in value]
+        if len(set(product_ids)) != len(product_ids):
+            raise serializers.ValidationError("Each product may appear only once")
+        missing = set(product_ids) - set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(f"Invalid product ids: {sorted(missing)}")
+        return value
+
+    def create(self, validated_data):
+        user = validated_data['user_id']
+        with transaction.atomic():
+            if validated_data.get('remove'):
+                CartUserProduct.objects.filter(user=user, product_id__in=validated_data['remove']).delete()
+            if validated_data.get('items'):
+                CartUserProduct.objects.bulk_create(
+                    [
+                        CartUserProduct(user=user, product_id=item['product_id'], quantity=item['quantity'])
+                        for item in validated_data['items']
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['user', 'product'],
+                    update_fields=['quantity']
+                )
+        return CartUserProduct.objects.filter(user=user).select_related('product')
+
+
+class OrderProductSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
 
     @staticmethod
@@ -76,7 +147,7 @@ class OrderProductSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'quantity', 'price']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     products = OrderProductSerializer(many=True, read_only=True)
 
     class Meta:
@@ -84,7 +155,7 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'total_price', 'created_at', 'products']
 
 
-class WishlistSerializer(serializers.ModelSerializer):
+class WishlistSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     user_id = serializers.HiddenField(default=serializers.CurrentUserDefault())
     product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
     product = ProductSerializer(read_only=True)
@@ -104,37 +175,51 @@ class WishlistSerializer(serializers.ModelSerializer):
         fields = ['id', 'user_id', 'product_id', 'product']
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     user_id = serializers.HiddenField(default=serializers.CurrentUserDefault())
     product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
     user = UserSerializer(read_only=True)
 
     def create(self, validated_data):
-        comment = Comment.objects.create(
-            user=validated_data['user_id'],
-            product=validated_data['product_id'],
-            text=validated_data['text']
-        )
+        with transaction.atomic():
+            comment = Comment.objects.create(
+                user=validated_data['user_id'],
+                product=validated_data['product_id'],
+                text=validated_data['text']
+            )
+            Product.objects.filter(pk=comment.product_id).update(comment_count=F('comment_count') + 1,
+                                                                 **latest_comment_fields(comment))
+            transaction.on_commit(bump_generation)
         return comment
 
     class Meta:
         model = Comment
-        fields = ['id', 'user_id', 'product_id', 'text', 'created_at', 'user']
+        fields = ['id', 'user_id', 'product_id', 'text', 'created_at', 'reply_count', 'user']
+        read_only_fields = ['reply_count']
 
 
-class ReplySerializer(serializers.ModelSerializer):
+class ReplySerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     user_id = serializers.HiddenField(default=serializers.CurrentUserDefault())
     comment_id = serializers.PrimaryKeyRelatedField(queryset=Comment.objects.all())
     user = UserSerializer(read_only=True)
 
     def create(self, validated_data):
-        reply = Reply.objects.create(
-            user=validated_data['user_id'],
-            comment=validated_data['comment_id'],
-            text=validated_data['text']
-        )
+        with transaction.atomic():
+            reply = Reply.objects.create(
+                user=validated_data['user_id'],
+                comment=validated_data['comment_id'],
+                text=validated_data['text']
+            )
+            Comment.objects.filter(pk=reply.comment_id).update(reply_count=F('reply_count') + 1)
         return reply
 
     class Meta:
         model = Reply
         fields = ['id', 'user_id', 'comment_id', 'text', 'created_at', 'user']
+
+
+class ImageJobSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ImageJob
+        fields = ['id', 'product', 'source', 'status', 'attempts', 'run_after', 'locked_by', 'result',
+                  'last_error', 'created_at', 'finished_at']
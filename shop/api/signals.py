@@ -0,0 +1,55 @@
+
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from . import jobs, search
+from .cache import bump_generation
+from .models import Category, Product
+from .price_index import index as price_index
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog(sender, **kwargs):
+    bump_generation()
+
+
+@receiver(pre_save, sender=Product)
+def remember_indexed_price(sender, instance, update_fields=None, **kwargs):
+    price_index.remember(instance, update_fields)
+
+
+@receiver(post_save, sender=Product)
+def update_price_index(sender, instance, created, update_fields=None, **kwargs):
+    price_index.saved(instance, created, update_fields)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_price_index(sender, instance, **kwargs):
+    price_index.deleted(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is None or search.INDEXED_FIELDS & set(update_fields):
+        search.index_product(instance, using)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, using, **kwargs):
+    search.remove_product(instance, using)
+
+
+@receiver(pre_save, sender=Product)
+def detect_image_upload(sender, instance, **kwargs):
+    instance._image_uploaded = bool(instance.image) and not instance.image._committed
+
+
+@receiver(post_save, sender=Product)
+def enqueue_image_job(sender, instance, **kwargs):
+    if instance.__dict__.pop('_image_uploaded', False):
+        jobs.enqueue(instance)
+
+
+def create_search_index(sender, using, **kwargs):
+    search.create_index(using)
@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.IMAGE_JOBS_MODE = 'eager'
+        settings.CATALOG_PRICE_INDEX_MODE = 'eager'
+        settings.SESSION_WRITE_BEHIND_DELAY = 0
+        settings.THROTTLE_SCOPES = {}
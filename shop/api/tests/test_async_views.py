@@ -0,0 +1,126 @@
+import json
+from base64 import b64encode
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from .. import search
+from ..models import Category, Product, Comment, Reply
+
+User = get_user_model()
+
+
+class ReadPathTests:
+    prefix = ''
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        self.products = [
+            Product.objects.create(name=f'Продукт {i}', description=f'Опис {i}', price=100 - i % 3,
+                                   category=self.category)
+            for i in range(25)
+        ]
+        self.comment = Comment.objects.create(user=self.user, product=self.products[0], text='Comment 1')
+        Comment.objects.create(user=self.user, product=self.products[1], text='Comment 2')
+        self.reply = Reply.objects.create(user=self.user, comment=self.comment, text='Reply 1')
+
+    async def fetch(self, url, params=None):
+        response = await self.async_client.get(url, params)
+        if response.streaming:
+            content = b''.join([chunk async for chunk in response])
+        else:
+            content = response.content
+        return response.status_code, json.loads(content)
+
+    async def get(self, name, *args, **params):
+        return await self.fetch(reverse(self.prefix + name, args=args), params)
+
+    async def collect(self, name, **params):
+        _, data = await self.get(name, **params)
+        ids = [item['id'] for item in data['results']]
+        while data['next']:
+            _, data = await self.fetch(data['next'])
+            ids += [item['id'] for item in data['results']]
+        return ids
+
+    async def test_get_product_list(self):
+        status_code, data = await self.get('product-list')
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(len(data['results']), 20)
+        self.assertEqual(data['results'][0]['name'], 'Продукт 0')
+
+    async def test_filter_products(self):
+        status_code, data = await self.get('product-list', price_gt=99, category=self.category.id)
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual({item['price'] for item in data['results']}, {100})
+
+    async def test_search_products(self):
+        search._fts5.clear()
+        status_code, data = await self.get('product-list', q='опис 7')
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertIn(self.products[7].id, [item['id'] for item in data['results']])
+
+    async def test_search_orders_by_rank(self):
+        mention = await Product.objects.acreate(name='Чохол', description='Для телефону', price=1,
+                                                category=self.category)
+        phone = await Product.objects.acreate(name='Телефон', description='Смартфон', price=1,
+                                              category=self.category)
+        self.assertEqual(await self.collect('product-list', q='телефон', page_size=1), [phone.id, mention.id])
+
+    async def test_walk_products_by_price(self):
+        ids = await self.collect('product-list', ordering='price', page_size=4)
+        expected = sorted(self.products, key=lambda product: (product.price, product.id))
+        self.assertEqual(sorted(ids), [product.id for product in self.products])
+        self.assertEqual([ids.index(product.id) for product in expected], list(range(len(expected))))
+
+    async def test_get_product(self):
+        status_code, data = await self.get('product-detail', self.products[0].id)
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(data['id'], self.products[0].id)
+
+    async def test_get_missing_product(self):
+        status_code, data = await self.get('product-detail', 0)
+        self.assertEqual(status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_get_category_list(self):
+        status_code, data = await self.get('category-list')
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(len(data['results']), 1)
+
+    async def test_get_comments(self):
+        status_code, data = await self.get('comment-list', product_id=self.products[0].id)
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(data['results'][0]['user']['username'], 'testuser')
+
+    async def test_get_replies(self):
+        status_code, data = await self.get('reply-list', comment_id=self.comment.id)
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual(len(data['results']), 1)
+
+
+class SyncReadPathTests(ReadPathTests, TestCase):
+    pass
+
+
+class AsyncReadPathTests(ReadPathTests, TestCase):
+    prefix = 'async-'
+
+    async def test_invalid_cursor_is_not_found(self):
+        for ordering, position, pk in (('price', 'cheap', 1), ('id', '1', 2 ** 70), ('price', str(2 ** 70), 1)):
+            with self.subTest(ordering=ordering, position=position, pk=pk):
+                cursor = b64encode(json.dumps([position, pk]).encode()).decode()
+                status_code, _ = await self.get('product-list', ordering=ordering, cursor=cursor)
+                self.assertEqual(status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_payloads_match_sync_path(self):
+        for name, args in [('product-list', ()), ('product-detail', (self.products[0].id,)),
+                           ('category-list', ()), ('comment-list', ()), ('reply-list', ())]:
+            _, async_data = await self.get(name, *args)
+            _, sync_data = await self.fetch(reverse(name, args=args))
+            if 'results' in sync_data:
+                sync_data, async_data = sync_data['results'], async_data['results']
+            self.assertEqual(async_data, sync_data)
@@ -0,0 +1,65 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import cache
+from ..models import Category, Product, User
+
+
+class CatalogCacheTests(APITestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        cache.stats.clear()
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        self.product = Product.objects.create(name='Product 1', description='Description 1', price=100,
+                                              category=self.category)
+
+    def test_second_request_is_served_from_cache(self):
+        url = reverse('product-list')
+        first = self.client.get(url, format='json')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(url, format='json')
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Type'], first['Content-Type'])
+        self.assertEqual(cache.stats, {'hits': 1, 'misses': 1})
+
+    def test_key_depends_on_filters_and_ordering(self):
+        url = reverse('product-list')
+        self.client.get(url, {'price_gt': 50}, format='json')
+        self.assertEqual(self.client.get(url, {'price_gt': 150}, format='json')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url, {'ordering': '-price'}, format='json')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url, {'price_gt': 50}, format='json')['X-Cache'], 'HIT')
+
+    def test_product_save_invalidates(self):
+        url = reverse('product-list')
+        self.client.get(url, format='json')
+        self.product.price = 200
+        self.product.save()
+        response = self.client.get(url, format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['price'], 200)
+
+    def test_category_delete_invalidates(self):
+        url = reverse('category-detail', args=[self.category.id])
+        self.assertEqual(self.client.get(url, format='json').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url, format='json')['X-Cache'], 'HIT')
+        self.category.delete()
+        self.assertEqual(self.client.get(url, format='json').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_errors_are_not_cached(self):
+        url = reverse('product-detail', args=[self.product.id + 1])
+        self.client.get(url, format='json')
+        self.assertNotIn('X-Cache', self.client.get(url, format='json'))
+
+    def test_browsable_api_pages_are_not_cached(self):
+        url = reverse('product-list')
+        self.client.force_login(User.objects.create_user(username='private-user', password='password'))
+        self.assertContains(self.client.get(url, HTTP_ACCEPT='text/html'), 'private-user')
+        self.client.logout()
+        response = self.client.get(url, HTTP_ACCEPT='text/html')
+        self.assertNotIn('X-Cache', response)
+        self.assertNotContains(response, 'private-user')
+        self.assertEqual(cache.stats['hits'] + cache.stats['misses'], 0)
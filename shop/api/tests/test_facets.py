@@ -0,0 +1,63 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import cache
+from ..models import Category, Product
+
+
+class ProductFacetTests(APITestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.phones = Category.objects.create(name='Smartphones')
+        self.fridges = Category.objects.create(name='Fridges')
+        for price in (500, 1500, 1700, 52999):
+            Product.objects.create(name=f'Телефон {price}', price=price, category=self.phones)
+        for price in (999, 25999):
+            Product.objects.create(name=f'Холодильник {price}', price=price, category=self.fridges)
+
+    def get(self, **params):
+        response = self.client.get(reverse('product-list'), {'facets': 1, **params}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_facets_are_opt_in(self):
+        response = self.client.get(reverse('product-list'), format='json')
+        self.assertNotIn('facets', response.data)
+
+    def test_category_counts_and_price_buckets(self):
+        self.assertEqual(self.get()['facets'], {
+            'categories': [{'id': self.phones.id, 'count': 4}, {'id': self.fridges.id, 'count': 2}],
+            'price': [
+                {'from': 0, 'to': 1000, 'count': 2},
+                {'from': 1000, 'to': 2000, 'count': 2},
+                {'from': 25000, 'to': 26000, 'count': 1},
+                {'from': 52000, 'to': 53000, 'count': 1},
+            ],
+        })
+
+    def test_bucket_width_param(self):
+        price = self.get(price_bucket=30000)['facets']['price']
+        self.assertEqual(price, [{'from': 0, 'to': 30000, 'count': 5}, {'from': 30000, 'to': 60000, 'count': 1}])
+
+    def test_respects_active_filters(self):
+        data = self.get(price_gt=900, price_lt=30000, q='телефон')
+        self.assertEqual(data['facets']['categories'], [{'id': self.phones.id, 'count': 2}])
+        self.assertEqual(len(data['results']), 2)
+
+    def test_single_group_by_query(self):
+        self.get(ordering='price')
+        cache.get_cache().clear()
+        with CaptureQueriesContext(connection) as context:
+            self.get(ordering='price', page_size=2)
+        grouped = [query['sql'] for query in context.captured_queries if 'GROUP BY' in query['sql']]
+        self.assertEqual(len(grouped), 1)
+
+    def test_cached_with_the_page(self):
+        first = self.client.get(reverse('product-list'), {'facets': 1}, format='json')
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('product-list'), {'facets': 1}, format='json')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
@@ -0,0 +1,140 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import idempotency
+from ..models import CartUserProduct, Category, IdempotencyKey, Order, Product, User
+
+
+class IdempotencyTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        self.product = Product.objects.create(name='Product 1', price=100, category=self.category)
+        self.client.force_authenticate(user=self.user)
+
+    def make_order(self, key):
+        return self.client.post(reverse('make_order'), format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_make_order_retry_replays_response(self):
+        CartUserProduct.objects.create(user=self.user, product=self.product, quantity=2)
+        first = self.make_order('order-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        CartUserProduct.objects.create(user=self.user, product=self.product, quantity=1)
+        second = self.make_order('order-1')
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_new_key_runs_again(self):
+        CartUserProduct.objects.create(user=self.user, product=self.product, quantity=2)
+        self.make_order('order-1')
+        CartUserProduct.objects.create(user=self.user, product=self.product, quantity=1)
+        response = self.make_order('order-2')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_keys_are_scoped_per_user(self):
+        other = User.objects.create_user(username='other', password='testpass')
+        CartUserProduct.objects.create(user=self.user, product=self.product, quantity=2)
+        CartUserProduct.objects.create(user=other, product=self.product, quantity=1)
+        self.make_order('order-1')
+        self.client.force_authenticate(user=other)
+        response = self.make_order('order-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total_price'], 100)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_cart_create_retry_does_not_add_quantity_twice(self):
+        url = reverse('cartuserproduct-list')
+        data = {'product_id': self.product.id, 'quantity': 2}
+        first = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+        second = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(CartUserProduct.objects.get().quantity, 2)
+
+    def test_cart_update_retry_is_replayed(self):
+        item = CartUserProduct.objects.create(user=self.user, product=self.product, quantity=1)
+        url = reverse('cartuserproduct-detail', args=[item.id])
+        first = self.client.patch(url, {'quantity': 3}, format='json', HTTP_IDEMPOTENCY_KEY='cart-2')
+        CartUserProduct.objects.filter(pk=item.pk).update(quantity=5)
+        second = self.client.patch(url, {'quantity': 3}, format='json', HTTP_IDEMPOTENCY_KEY='cart-2')
+        self.assertEqual(second.data, first.data)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 5)
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        url = reverse('cartuserproduct-list')
+        self.client.post(url, {'product_id': self.product.id, 'quantity': 2},
+                         format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+        response = self.client.post(url, {'product_id': self.product.id, 'quantity': 5},
+                                    format='json', HTTP_IDEMPOTENCY_KEY='cart-1')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(CartUserProduct.objects.get().quantity, 2)
+
+    def start_first_request(self, key, **kwargs):
+        return IdempotencyKey.objects.create(
+            user=self.user, key=idempotency.make_key('POST', reverse('make_order'), key),
+            fingerprint=idempotency.fingerprint({}), locked_until=timezone.now() + timedelta(seconds=30), **kwargs)
+
+    def test_duplicate_waits_for_first_request(self):
+        CartUserProduct.objects.create(user=self.user, product=self.product, quantity=2)
+        record = self.start_first_request('order-1')
+
+        def finish_first_request(seconds):
+            record.status_code, record.response, record.locked_until = 201, {'id': 42}, None
+            record.save()
+
+        with mock.patch.object(idempotency.time, 'sleep', side_effect=finish_first_request):
+            response = self.make_order('order-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'id': 42})
+        self.assertEqual(Order.objects.count(), 0)
+
+    @override_settings(IDEMPOTENCY_WAIT=0.1)
+    def test_duplicate_gives_up_while_first_is_in_progress(self):
+        self.start_first_request('order-1')
+        response = self.make_order('order-1')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_stale_lock_is_taken_over(self):
+        CartUserProduct.objects.create(user=self.user, product=self.product, quantity=2)
+        record = self.start_first_request('order-1')
+        IdempotencyKey.objects.filter(pk=record.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.make_order('order-1').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_out_of_stock_is_not_replayed(self):
+        self.product.stock = 1
+        self.product.save()
+        CartUserProduct.objects.create(user=self.user, product=self.product, quantity=2)
+        self.assertEqual(self.make_order('order-1').status_code, status.HTTP_409_CONFLICT)
+        self.product.stock = 5
+        self.product.save()
+        response = self.make_order('order-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_failed_request_releases_the_key(self):
+        with mock.patch('api.views.place_order', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.make_order('order-1')
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    @override_settings(IDEMPOTENCY_TIMEOUT=60)
+    def test_expired_keys_run_again(self):
+        CartUserProduct.objects.create(user=self.user, product=self.product, quantity=2)
+        self.make_order('order-1')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        CartUserProduct.objects.create(user=self.user, product=self.product, quantity=1)
+        self.assertEqual(self.make_order('order-1').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
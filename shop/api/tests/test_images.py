@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import images
+from ..models import Category, Product
+from ..serializers import ProductSerializer
+
+
+def make_image(width=1200, height=800, color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'WEBP')
+    return buffer.getvalue()
+
+
+class ImageVariantTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.category = Category.objects.create(name='Category 1')
+        with open(os.path.join(self.media_root, 'phone-1.webp'), 'wb') as file:
+            file.write(make_image())
+        self.product = Product.objects.create(name='Product 1', price=100, category=self.category,
+                                              image='phone-1.webp')
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def variant_files(self):
+        return sorted(
+            name for _, _, names in os.walk(os.path.join(self.media_root, 'variants')) for name in names
+        )
+
+    def variant_url(self, size, name):
+        return f'{reverse("image-variant", args=[size, name])}?v={images.get_version(name)}'
+
+    def test_serializer_exposes_variant_urls(self):
+        data = ProductSerializer(self.product).data
+        version = images.get_digest('phone-1.webp')[:16]
+        self.assertEqual(data['image_variants'], {
+            '128': f'/api/images/128/phone-1.webp?v={version}',
+            '256': f'/api/images/256/phone-1.webp?v={version}',
+            '512': f'/api/images/512/phone-1.webp?v={version}',
+        })
+        self.product.image = None
+        self.assertIsNone(ProductSerializer(self.product).data['image_variants'])
+
+    def test_variant_is_generated_lazily_and_cached(self):
+        self.assertEqual(self.variant_files(), [])
+        response = self.client.get(self.variant_url(256, 'phone-1.webp'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (256, 171))
+        self.assertEqual(len(self.variant_files()), 1)
+
+        response = self.client.get(self.variant_url(256, 'phone-1.webp'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(self.variant_files()), 1)
+
+    def test_unversioned_and_stale_urls_redirect(self):
+        url = reverse('image-variant', args=[256, 'phone-1.webp'])
+        for query in ('', '?v=0123456789abcdef'):
+            with self.subTest(query=query):
+                response = self.client.get(url + query)
+                self.assertRedirects(response, self.variant_url(256, 'phone-1.webp'), fetch_redirect_response=False)
+                self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+
+    def test_changed_file_gets_a_new_url(self):
+        old_url = ProductSerializer(self.product).data['image_variants']['256']
+        with open(os.path.join(self.media_root, 'phone-1.webp'), 'wb') as file:
+            file.write(make_image(color='green'))
+        os.utime(os.path.join(self.media_root, 'phone-1.webp'), (1, 1))
+        new_url = ProductSerializer(self.product).data['image_variants']['256']
+        self.assertNotEqual(new_url, old_url)
+        self.assertRedirects(self.client.get(old_url), new_url, fetch_redirect_response=False)
+        self.assertEqual(self.client.get(new_url).status_code, status.HTTP_200_OK)
+
+    def test_only_product_images_are_sources(self):
+        with open(os.path.join(self.media_root, 'other.webp'), 'wb') as file:
+            file.write(make_image())
+        variant_name, _ = images.get_variant('phone-1.webp', 128)
+        for name in ('other.webp', variant_name):
+            with self.subTest(name=name):
+                response = self.client.get(reverse('image-variant', args=[128, name]))
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_variants_are_content_addressed(self):
+        shutil.copy(os.path.join(self.media_root, 'phone-1.webp'), os.path.join(self.media_root, 'copy.webp'))
+        first, digest = images.get_variant('phone-1.webp', 128)
+        second, _ = images.get_variant('copy.webp', 128)
+        self.assertEqual(first, second)
+        self.assertIn(digest, first)
+
+    def test_small_images_are_not_upscaled(self):
+        with open(os.path.join(self.media_root, 'small.webp'), 'wb') as file:
+            file.write(make_image(100, 50))
+        Product.objects.create(name='Product 2', price=100, category=self.category, image='small.webp')
+        response = self.client.get(self.variant_url(512, 'small.webp'))
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (100, 50))
+
+    def test_unknown_size_or_source_is_not_found(self):
+        with open(os.path.join(self.media_root, 'broken.webp'), 'wb') as file:
+            file.write(b'not an image')
+        for size, name in ((300, 'phone-1.webp'), (128, 'missing.webp'), (128, 'broken.webp')):
+            with self.subTest(size=size, name=name):
+                response = self.client.get(reverse('image-variant', args=[size, name]))
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_upload_generates_variants_eagerly(self):
+        Product.objects.create(name='Product 2', price=100, category=self.category,
+                               image=SimpleUploadedFile('upload.webp', make_image(color='blue')))
+        self.assertEqual(len(self.variant_files()), 3)
@@ -0,0 +1,130 @@
+import io
+import re
+
+from django.db import connection
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APITestCase
+
+from .. import instrumentation
+from ..middleware import InstrumentationMiddleware
+from ..models import Category, Order, OrderProduct, Product, User
+
+SERVER_TIMING = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries", serialize;dur=([\d.]+), '
+                           r'render;dur=([\d.]+), total;dur=([\d.]+)')
+
+
+class HistogramTests(SimpleTestCase):
+    def test_percentiles_are_within_bucket_precision(self):
+        histogram = instrumentation.Histogram()
+        for value in range(1, 1001):
+            histogram.add(value)
+        for percent, expected in ((50, 500), (95, 950), (99, 990)):
+            self.assertAlmostEqual(histogram.percentile(percent), expected, delta=expected * 0.05)
+        self.assertEqual(histogram.percentile(100), 1000)
+
+    def test_zeros(self):
+        histogram = instrumentation.Histogram()
+        for value in (0, 0, 0, 5):
+            histogram.add(value)
+        self.assertEqual(histogram.summary(), {'p50': 0, 'p95': 5, 'p99': 5, 'max': 5})
+
+
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        instrumentation.registry.reset()
+        self.user = User.objects.create_user(username='user', password='password')
+        category = Category.objects.create(name='Category 1')
+        self.products = [Product.objects.create(name=f'Product {i}', price=100 + i, category=category)
+                         for i in range(12)]
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('product-list'), {'ordering': 'price'})
+        queries, serialize, render, total = SERVER_TIMING.fullmatch(response['Server-Timing']).groups()
+        self.assertEqual(int(queries), len(context.captured_queries))
+        self.assertGreater(float(total), 0)
+        self.assertGreaterEqual(float(total), float(serialize) + float(render))
+
+    def test_values_serializer_and_render_time_are_recorded(self):
+        order = Order.objects.create(user=self.user, total_price=100)
+        OrderProduct.objects.create(order=order, product=self.products[0], quantity=1, price=100)
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('order-list'))
+        _, serialize, render, _ = SERVER_TIMING.fullmatch(response['Server-Timing']).groups()
+        self.assertGreater(float(serialize) + float(render), 0)
+
+    def test_model_serializer_time_is_recorded(self):
+        response = self.client.get(reverse('category-list'))
+        _, serialize, _, _ = SERVER_TIMING.fullmatch(response['Server-Timing']).groups()
+        self.assertGreater(float(serialize), 0)
+        self.assertFalse(hasattr(BaseSerializer.data.fget, '__wrapped__'))
+
+    def test_stats_per_route(self):
+        for _ in range(3):
+            self.client.get(reverse('product-list'))
+        self.client.get(reverse('product-detail', args=[self.products[0].id]))
+
+        url = reverse('instrumentation')
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='password',
+                                                                is_staff=True))
+        stats = self.client.get(url).json()
+        self.assertEqual(stats['GET product-list']['count'], 3)
+        self.assertEqual(stats['GET product-detail']['count'], 1)
+        self.assertEqual(set(stats['GET product-list']['total_ms']), {'p50', 'p95', 'p99', 'max'})
+        self.assertGreater(stats['GET product-list']['size']['max'], 0)
+
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(self.client.get(url).json()), ['DELETE instrumentation'])
+
+    @override_settings(INSTRUMENTATION_N_PLUS_ONE_THRESHOLD=5)
+    def test_warns_about_repeated_queries(self):
+        def view(request):
+            for product in self.products:
+                Product.objects.filter(id__in=[product.id, product.id + 1]).count()
+                Category.objects.get(pk=product.category_id)
+            return HttpResponse()
+
+        request = RequestFactory().get('/n-plus-one/')
+        with self.assertLogs('api.instrumentation', 'WARNING') as logs:
+            InstrumentationMiddleware(view)(request)
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn('ran 12 times', logs.output[0])
+        self.assertIn('IN (...)', ''.join(logs.output))
+        self.assertEqual(instrumentation.registry.snapshot()['GET <unresolved>']['n_plus_one'], 1)
+
+    def test_streaming_responses_are_recorded_when_closed(self):
+        def view(request):
+            def rows():
+                for product in self.products[:3]:
+                    yield Product.objects.get(pk=product.pk).name.encode()
+            return StreamingHttpResponse(rows())
+
+        response = InstrumentationMiddleware(view)(RequestFactory().get('/stream/'))
+        self.assertEqual(instrumentation.registry.snapshot(), {})
+        content = b''.join(response.streaming_content)
+        response.close()
+        stats = instrumentation.registry.snapshot()['GET <unresolved>']
+        self.assertEqual(stats['queries']['max'], 3)
+        self.assertEqual(stats['size']['max'], len(content))
+
+    def test_file_responses_keep_their_file(self):
+        def view(request):
+            return FileResponse(io.BytesIO(b'x' * 1000), content_type='image/webp')
+
+        response = InstrumentationMiddleware(view)(RequestFactory().get('/media/image.webp'))
+        self.assertIsNotNone(response.file_to_stream)
+        response.close()
+        self.assertEqual(instrumentation.registry.snapshot()['GET <unresolved>']['size']['max'], 1000)
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('product-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(instrumentation.registry.snapshot(), {})
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import jobs
+from ..models import Category, ImageJob, Product, User
+
+
+def make_image(image_format='PNG', size=(640, 480)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'green').save(buffer, image_format)
+    return buffer.getvalue()
+
+
+class ImageJobTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.category = Category.objects.create(name='Category 1')
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def upload(self, content, name='upload.png'):
+        return Product.objects.create(name='Product 1', price=100, category=self.category,
+                                      image=SimpleUploadedFile(name, content))
+
+    def variant_count(self):
+        return sum(len(names) for _, _, names in os.walk(os.path.join(self.media_root, 'variants')))
+
+    def test_upload_is_reencoded_to_webp_with_variants(self):
+        product = self.upload(make_image())
+        job = ImageJob.objects.get(product=product)
+        self.assertEqual((job.status, job.attempts, job.source), (ImageJob.DONE, 1, 'upload.png'))
+        self.assertEqual(job.result, 'upload.webp')
+        product.refresh_from_db()
+        self.assertEqual(product.image.name, 'upload.webp')
+        with Image.open(os.path.join(self.media_root, 'upload.webp')) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (640, 480)))
+        self.assertEqual(self.variant_count(), 3)
+
+    def test_webp_uploads_are_kept(self):
+        product = self.upload(make_image('WEBP'), 'upload.webp')
+        self.assertEqual(product.image_jobs.get().result, 'upload.webp')
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'upload.png')))
+
+    def test_invalid_image_fails_without_retry(self):
+        with self.assertLogs('api.jobs', 'ERROR'):
+            product = self.upload(b'not an image')
+        job = product.image_jobs.get()
+        self.assertEqual((job.status, job.attempts), (ImageJob.FAILED, 1))
+        self.assertIn('UnidentifiedImageError', job.last_error)
+        self.assertIsNone(jobs.run_next())
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        with mock.patch('api.images.generate_variants', side_effect=OSError('disk full')), \
+                self.assertLogs('api.jobs', 'WARNING'):
+            product = self.upload(make_image())
+        job = product.image_jobs.get()
+        self.assertEqual((job.status, job.attempts), (ImageJob.PENDING, 1))
+        self.assertIn('disk full', job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(jobs.run_next())
+
+        ImageJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = jobs.run_next()
+        self.assertEqual((job.status, job.attempts), (ImageJob.DONE, 2))
+        self.assertEqual(self.variant_count(), 3)
+
+    @override_settings(IMAGE_JOBS_MAX_ATTEMPTS=2)
+    def test_gives_up_after_max_attempts(self):
+        with mock.patch('api.images.generate_variants', side_effect=OSError('disk full')), \
+                self.assertLogs('api.jobs', 'WARNING'):
+            job = self.upload(make_image()).image_jobs.get()
+            ImageJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            job = jobs.run_next()
+        self.assertEqual((job.status, job.attempts), (ImageJob.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_backoff_grows_and_is_capped(self):
+        with override_settings(IMAGE_JOBS_BACKOFF=10, IMAGE_JOBS_MAX_BACKOFF=60):
+            self.assertLessEqual(jobs.get_backoff(1), timedelta(seconds=10))
+            self.assertGreaterEqual(jobs.get_backoff(3), timedelta(seconds=20))
+            self.assertLessEqual(jobs.get_backoff(10), timedelta(seconds=60))
+
+    @override_settings(IMAGE_JOBS_MODE='external')
+    def test_claim_is_exclusive_and_stale_jobs_are_reclaimed(self):
+        self.upload(make_image())
+        job = jobs.claim('worker-1')
+        self.assertEqual((job.status, job.locked_by), (ImageJob.RUNNING, 'worker-1'))
+        self.assertIsNone(jobs.claim('worker-2'))
+
+        ImageJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        job = jobs.claim('worker-2')
+        self.assertEqual((job.locked_by, job.attempts), ('worker-2', 2))
+
+    @override_settings(IMAGE_JOBS_MODE='external')
+    def test_command_drains_due_jobs(self):
+        product = self.upload(make_image())
+        self.assertEqual(product.image_jobs.get().status, ImageJob.PENDING)
+        out = StringIO()
+        call_command('run_image_workers', '--once', stdout=out)
+        self.assertIn('Processed 1 image jobs.', out.getvalue())
+        product.refresh_from_db()
+        self.assertEqual((product.image_jobs.get().status, product.image.name), (ImageJob.DONE, 'upload.webp'))
+
+    @override_settings(IMAGE_JOBS_MODE='external')
+    def test_newer_upload_is_not_overwritten(self):
+        product = self.upload(make_image())
+        product.image = SimpleUploadedFile('newer.webp', make_image('WEBP'))
+        product.save()
+        call_command('run_image_workers', '--once', stdout=StringIO())
+        product.refresh_from_db()
+        self.assertEqual(product.image.name, 'newer.webp')
+
+    def test_status_endpoint_is_admin_only(self):
+        self.upload(make_image())
+        with self.assertLogs('api.jobs', 'ERROR'):
+            self.upload(b'not an image', 'broken.png')
+        url = reverse('imagejob-list')
+        self.client.force_authenticate(User.objects.create_user(username='user', password='password'))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='password',
+                                                                is_staff=True))
+        response = self.client.get(url, {'status': ImageJob.FAILED})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([job['source'] for job in response.data['results']], ['broken.png'])
+        response = self.client.get(reverse('imagejob-summary'))
+        self.assertEqual(response.data, {'pending': 0, 'running': 0, 'done': 1, 'failed': 1})
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class MediaServingTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.content = bytes(range(256)) * 4
+        self.path = os.path.join(self.media_root, 'phone 1.webp')
+        with open(self.path, 'wb') as file:
+            file.write(self.content)
+        self.url = reverse('media', args=['phone 1.webp'])
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def get(self, url=None, **headers):
+        return self.client.get(url or self.url, headers=headers)
+
+    def test_full_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Last-Modified'], http_date(int(os.stat(self.path).st_mtime)))
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        self.assertTrue(response['ETag'])
+
+    def test_byte_ranges(self):
+        for header, start, end in (('bytes=0-9', 0, 9), ('bytes=1000-', 1000, 1023), ('bytes=-5', 1019, 1023),
+                                   ('bytes=1020-5000', 1020, 1023)):
+            with self.subTest(header=header):
+                response = self.get(Range=header)
+                self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+                self.assertEqual(b''.join(response.streaming_content), self.content[start:end + 1])
+                self.assertEqual(response['Content-Length'], str(end - start + 1))
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/1024')
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range='bytes=2048-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_unsupported_ranges_serve_the_whole_file(self):
+        for header in ('bytes=0-1,5-6', 'items=0-1'):
+            with self.subTest(header=header):
+                self.assertEqual(self.get(Range=header).status_code, status.HTTP_200_OK)
+
+    def test_if_range_with_stale_etag_serves_the_whole_file(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(Range='bytes=0-9', If_Range=etag).status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(self.get(Range='bytes=0-9', If_Range='"stale"').status_code, status.HTTP_200_OK)
+
+    def test_conditional_requests(self):
+        response = self.get()
+        self.assertEqual(self.get(If_None_Match=response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.get(If_Modified_Since=response['Last-Modified']).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+
+    def test_head(self):
+        response = self.client.head(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Length'], '1024')
+        self.assertEqual(response.content, b'')
+
+    def test_missing_and_outside_files_are_not_found(self):
+        self.assertEqual(self.get(reverse('media', args=['missing.webp'])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get('/media/../manage.py').status_code, status.HTTP_404_NOT_FOUND)
+        os.mkdir(os.path.join(self.media_root, 'variants'))
+        self.assertEqual(self.get(reverse('media', args=['variants'])).status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        response = self.get(Range='bytes=0-9')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/phone%201.webp')
+        self.assertEqual(response.content, b'')
+        self.assertNotIn('Content-Type', response)
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_x_sendfile(self):
+        response = self.get()
+        self.assertEqual(response['X-Sendfile'], self.path)
+        self.assertEqual(response.content, b'')
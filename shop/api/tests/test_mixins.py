@@ -0,0 +1,187 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..mixins import StreamingListMixin, plan_related
+from ..models import Category, Product, CartUserProduct, Order, OrderProduct, Wishlist, Comment, Reply
+from ..serializers import (ProductSerializer, CartUserProductSerializer, OrderSerializer, CommentSerializer,
+                           ReplySerializer)
+
+User = get_user_model()
+
+
+class PlanRelatedTest(TestCase):
+    def test_flat_serializer(self):
+        self.assertEqual(plan_related(ProductSerializer()), ([], []))
+
+    def test_forward_relation(self):
+        self.assertEqual(plan_related(CartUserProductSerializer()), (['product'], []))
+        self.assertEqual(plan_related(CommentSerializer()), (['user'], []))
+        self.assertEqual(plan_related(ReplySerializer()), (['user'], []))
+
+    def test_reverse_relation_with_nested_forward_relation(self):
+        self.assertEqual(plan_related(OrderSerializer()), ([], ['products', 'products__product']))
+
+
+class ListQueryCountTests(APITestCase):
+    rows = 5
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.user.is_staff = True
+        self.user.save()
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        for i in range(self.rows):
+            user = User.objects.create(username=f'user{i}')
+            product = Product.objects.create(name=f'Product {i}', price=100 + i, category=self.category)
+            CartUserProduct.objects.create(user=self.user, product=product, quantity=2)
+            Wishlist.objects.create(user=self.user, product=product)
+            order = Order.objects.create(user=self.user, total_price=200)
+            OrderProduct.objects.create(order=order, product=product, quantity=2, price=100)
+            comment = Comment.objects.create(user=user, product=product, text=f'Comment {i}')
+            Reply.objects.create(user=user, comment=comment, text=f'Reply {i}')
+        self.client.force_authenticate(user=self.user)
+
+    def assertListQueries(self, name, num_queries, count):
+        # Catalog and order endpoints also run one aggregate per validator for ETag/Last-Modified.
+        with self.assertNumQueries(num_queries):
+            response = self.client.get(reverse(name), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), count)
+
+    def test_users(self):
+        self.assertListQueries('user-list', 1, self.rows + 1)
+
+    def test_categories(self):
+        self.assertListQueries('category-list', 2, 1)
+
+    def test_products(self):
+        self.assertListQueries('product-list', 2, self.rows)
+
+    def test_cart(self):
+        self.assertListQueries('cartuserproduct-list', 1, self.rows)
+
+    def test_orders(self):
+        self.assertListQueries('order-list', 4, self.rows)
+
+    def test_wishlist(self):
+        self.assertListQueries('wishlist-list', 1, self.rows)
+
+    def test_comments(self):
+        self.assertListQueries('comment-list', 1, self.rows)
+
+    def test_replies(self):
+        self.assertListQueries('reply-list', 1, self.rows)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        self.product = Product.objects.create(name='Product 1', price=100, category=self.category)
+        self.client.force_authenticate(user=self.user)
+
+    def test_products_not_modified(self):
+        url = reverse('product-list')
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_etag_depends_on_query(self):
+        url = reverse('product-list')
+        etag = self.client.get(url, format='json')['ETag']
+        response = self.client.get(url, {'ordering': '-price'}, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_product_change_changes_etag(self):
+        url = reverse('product-detail', args=[self.product.id])
+        etag = self.client.get(url, format='json')['ETag']
+        self.product.price = 150
+        self.product.save()
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_categories_if_modified_since(self):
+        url = reverse('category-list')
+        last_modified = self.client.get(url, format='json')['Last-Modified']
+        response = self.client.get(url, format='json', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_delete_changes_last_modified(self):
+        url = reverse('product-list')
+        Product.objects.create(name='Product 2', price=200, category=self.category)
+        last_modified = self.client.get(url, format='json')['Last-Modified']
+        with mock.patch.object(timezone, 'now', return_value=timezone.now() + timedelta(seconds=2)):
+            self.product.delete()
+        response = self.client.get(url, format='json', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_orders_change_with_new_order(self):
+        url = reverse('order-list')
+        Order.objects.create(user=self.user, total_price=100)
+        etag = self.client.get(url, format='json')['ETag']
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Order.objects.create(user=self.user, total_price=200)
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+
+
+class StreamingListTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.user.is_staff = True
+        self.user.save()
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        for i in range(5):
+            product = Product.objects.create(name=f'Product {i}', price=100 + i, category=self.category)
+            CartUserProduct.objects.create(user=self.user, product=product, quantity=2)
+            order = Order.objects.create(user=self.user, total_price=200)
+            OrderProduct.objects.create(order=order, product=product, quantity=2, price=100)
+        self.client.force_authenticate(user=self.user)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_json_array_matches_list(self):
+        url = reverse('order-list')
+        expected = self.client.get(url, format='json').json()['results']
+        content = self.read(self.client.get(url, {'stream': 1}, format='json'))
+        self.assertEqual(json.loads(content), expected)
+
+    def test_ndjson(self):
+        url = reverse('cartuserproduct-list')
+        response = self.client.get(url, {'stream': 'ndjson'}, format='json')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.read(response).splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0])['product']['name'], 'Product 0')
+
+    def test_empty(self):
+        CartUserProduct.objects.all().delete()
+        content = self.read(self.client.get(reverse('cartuserproduct-list'), {'stream': 1}, format='json'))
+        self.assertEqual(json.loads(content), [])
+
+    def test_rows_are_fetched_in_chunks(self):
+        with mock.patch.object(StreamingListMixin, 'stream_chunk_size', 2):
+            response = self.client.get(reverse('order-list'), {'stream': 1}, format='json')
+            # One orders query, then one order lines query for each chunk of two orders.
+            with self.assertNumQueries(4):
+                self.assertEqual(len(json.loads(self.read(response))), 5)
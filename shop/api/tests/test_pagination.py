@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import price_index
+from ..models import Category, Product, Comment
+from ..pagination import KeysetPagination
+
+User = get_user_model()
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Product {i}', description=f'Description {i}', price=i % 5, category=self.category)
+            for i in range(45)
+        ])
+        price_index.index.invalidate()
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_first_page_is_limited(self):
+        response = self.client.get(reverse('product-list'), format='json')
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNone(response.data['previous'])
+        self.assertNotIn('count', response.data)
+
+    def test_page_size_query_param(self):
+        response = self.client.get(reverse('product-list'), {'page_size': 7}, format='json')
+        self.assertEqual(len(response.data['results']), 7)
+
+    def test_walk_all_pages_by_id(self):
+        ids = self.collect(reverse('product-list'))
+        self.assertEqual(ids, sorted(product.id for product in self.products))
+
+    def test_walk_all_pages_by_price_with_ties(self):
+        ids = self.collect(reverse('product-list') + '?ordering=-price')
+        expected = sorted(self.products, key=lambda product: (-product.price, -product.id))
+        self.assertEqual(ids, [product.id for product in expected])
+
+    def test_page_query_count_does_not_grow_with_depth(self):
+        response = self.client.get(reverse('product-list'), format='json')
+        with self.assertNumQueries(1):
+            self.client.get(response.data['next'], format='json')
+
+    def test_created_at_ordering(self):
+        comments = [Comment.objects.create(user=self.user, product=self.products[0], text=str(i)) for i in range(25)]
+        ids = self.collect(reverse('comment-list'))
+        self.assertEqual(ids, [comment.id for comment in reversed(comments)])
+
+    def test_optional_count(self):
+        response = self.client.get(reverse('product-list'), {'count': 1, 'category': self.category.id}, format='json')
+        self.assertEqual(response.data['count'], 45)
+        self.assertTrue(response.data['count_is_exact'])
+
+    def test_count_is_capped(self):
+        with mock.patch.object(KeysetPagination, 'count_limit', 10):
+            response = self.client.get(reverse('product-list'), {'count': 'true'}, format='json')
+        self.assertEqual(response.data['count'], 10)
+        self.assertFalse(response.data['count_is_exact'])
@@ -0,0 +1,130 @@
+import time
+from unittest import mock
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import cache, price_index
+from ..filters import ProductFilter
+from ..models import Category, Product
+
+
+class PriceIndexTests(APITestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        price_index.index.reset()
+        price_index.index.building = False
+        self.categories = [Category.objects.create(name=f'Category {i}') for i in range(2)]
+        self.products = [
+            Product.objects.create(name=f'Product {i}', price=i % 7 * 10, category=self.categories[i % 2])
+            for i in range(40)
+        ]
+
+    def collect(self, params):
+        ids, url = [], reverse('product-list')
+        response = self.client.get(url, params, format='json')
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            ids.extend(item['id'] for item in data['results'])
+            if not data['next']:
+                return ids
+            response = self.client.get(data['next'], format='json')
+
+    def assertMatchesOrm(self, params):
+        ids = self.collect(params)
+        ordering = params['ordering']
+        filters = {key: value for key, value in params.items() if key in ('price_gt', 'price_lt', 'category')}
+        queryset = ProductFilter(filters, queryset=Product.objects.all()).qs
+        expected = queryset.order_by(ordering, ordering.replace('price', 'id')).values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+        return ids
+
+    def test_pages_match_orm(self):
+        category = self.categories[1].id
+        for params in (
+            {'ordering': 'price', 'page_size': 3},
+            {'ordering': '-price', 'page_size': 4},
+            {'ordering': 'price', 'price_gt': 10, 'price_lt': 50, 'page_size': 2},
+            {'ordering': '-price', 'category': category, 'price_gt': 0, 'page_size': 3},
+            {'ordering': 'price', 'category': 999},
+        ):
+            with self.subTest(params=params):
+                self.assertMatchesOrm(params)
+
+    def test_page_is_hydrated_by_primary_key(self):
+        self.client.get(reverse('product-list'), {'ordering': 'price'}, format='json')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('product-list'), {'ordering': 'price', 'price_gt': 20}, format='json')
+        self.assertEqual(len(response.data['results']), 20)
+        page_query = context.captured_queries[-1]['sql']
+        self.assertIn('"api_product"."id" IN', page_query)
+        self.assertNotIn('ORDER BY', page_query)
+
+    def test_count(self):
+        response = self.client.get(reverse('product-list'), {'ordering': 'price', 'price_gt': 30, 'count': 1},
+                                   format='json')
+        self.assertEqual(response.data['count'], sum(product.price > 30 for product in self.products))
+
+    def test_save_and_delete_update_index_incrementally(self):
+        self.collect({'ordering': 'price'})
+        with mock.patch.object(price_index.index, 'build') as build:
+            self.products[0].price = 1000
+            self.products[0].save()
+            self.products[1].category = self.categories[0]
+            self.products[1].save()
+            self.products[2].delete()
+            Product.objects.create(name='New', price=15, category=self.categories[1])
+            ids = self.assertMatchesOrm({'ordering': '-price'})
+            self.assertMatchesOrm({'ordering': 'price', 'category': self.categories[0].id})
+        build.assert_not_called()
+        self.assertEqual(ids[0], self.products[0].id)
+        self.assertNotIn(self.products[2].id, ids)
+
+    def test_disabled_index_uses_orm(self):
+        with override_settings(CATALOG_PRICE_INDEX=False), mock.patch.object(price_index, 'query') as query:
+            self.assertMatchesOrm({'ordering': 'price'})
+        query.assert_not_called()
+
+    def test_id_ordering_uses_orm(self):
+        with mock.patch.object(price_index, 'query') as query:
+            self.assertMatchesOrm({'ordering': 'id', 'category': self.categories[0].id})
+        query.assert_not_called()
+
+    def test_save_without_price_change_keeps_version(self):
+        self.collect({'ordering': 'price'})
+        version = price_index.index.version
+        self.products[0].name = 'Renamed'
+        self.products[0].save()
+        self.assertEqual(price_index.index.version, version)
+
+    def test_stale_entries_fall_back_to_orm(self):
+        self.collect({'ordering': 'price'})
+        Product.objects.filter(pk=self.products[0].pk).update(price=999)
+        self.assertMatchesOrm({'ordering': 'price', 'page_size': 50})
+        self.assertIsNone(price_index.index.version)
+
+    def test_old_index_is_rebuilt(self):
+        self.collect({'ordering': 'price'})
+        Product.objects.bulk_create([Product(name='Other worker', price=5, category=self.categories[0])])
+        with mock.patch.object(price_index.time, 'monotonic', return_value=time.monotonic() + 61):
+            ids = self.assertMatchesOrm({'ordering': 'price', 'page_size': 50})
+        self.assertEqual(len(ids), 41)
+
+    @override_settings(CATALOG_PRICE_INDEX_MODE='thread')
+    def test_background_build_serves_orm_until_ready(self):
+        with mock.patch.object(price_index.threading, 'Thread') as thread:
+            self.assertMatchesOrm({'ordering': 'price', 'page_size': 10})
+        thread.assert_called_once()
+        self.assertIsNone(price_index.index.version)
+
+    def test_bulk_writes_need_invalidate(self):
+        self.collect({'ordering': 'price'})
+        Product.objects.bulk_create([Product(name='Bulk', price=5, category=self.categories[0])])
+        price_index.index.invalidate()
+        ids = self.assertMatchesOrm({'ordering': 'price', 'page_size': 50})
+        self.assertEqual(len(ids), 41)
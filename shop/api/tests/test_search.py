@@ -0,0 +1,79 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import cache, search
+from ..models import Category, Product
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.phones = Category.objects.create(name='Smartphones')
+        self.fridges = Category.objects.create(name='Fridges')
+        self.samsung = Product.objects.create(name='Мобільний телефон Samsung Galaxy A24', price=7599,
+                                              description='Екран 6.5" Super AMOLED', category=self.phones)
+        self.iphone = Product.objects.create(name='Мобільний телефон Apple iPhone 15 Pro', price=52999,
+                                             description='Екран 6.7" OLED', category=self.phones)
+        self.fridge = Product.objects.create(name='Холодильник Samsung RB38', price=25999,
+                                             description='Підключення до телефону через Wi-Fi', category=self.fridges)
+
+    def search(self, q, **params):
+        response = self.client.get(reverse('product-list'), {'q': q, **params}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_cyrillic_is_case_insensitive(self):
+        self.assertEqual(self.search('ХОЛОДИЛЬНИК'), [self.fridge.id])
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search('холод'), [self.fridge.id])
+        self.assertEqual(sorted(self.search('Sams')), sorted([self.samsung.id, self.fridge.id]))
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('samsung телефон galaxy'), [self.samsung.id])
+
+    def test_name_matches_rank_above_description_matches(self):
+        ids = self.search('телефон')
+        self.assertEqual(ids[-1], self.fridge.id)
+        self.assertEqual(set(ids), {self.samsung.id, self.iphone.id, self.fridge.id})
+
+    def test_combines_with_filters_and_ordering(self):
+        self.assertEqual(self.search('samsung', category=self.fridges.id), [self.fridge.id])
+        self.assertEqual(self.search('samsung', ordering='-price'), [self.fridge.id, self.samsung.id])
+
+    def test_ranked_results_paginate(self):
+        Product.objects.bulk_create([
+            Product(name=f'Телефон {i}', price=i, category=self.phones) for i in range(30)
+        ])
+        call_command('rebuild_search_index', stdout=StringIO())
+        ids, response = [], self.client.get(reverse('product-list'), {'q': 'телефон', 'page_size': 7})
+        while True:
+            ids.extend(item['id'] for item in response.json()['results'])
+            if not response.json()['next']:
+                break
+            response = self.client.get(response.json()['next'])
+        self.assertEqual(len(ids), 33)
+        self.assertEqual(len(set(ids)), 33)
+        self.assertEqual(ids[-1], self.fridge.id)
+
+    def test_save_reindexes(self):
+        self.fridge.name = 'Морозильна камера Bosch'
+        self.fridge.save()
+        self.assertEqual(self.search('холодильник'), [])
+        self.assertEqual(self.search('морозильна'), [self.fridge.id])
+
+    def test_delete_removes_from_index(self):
+        self.fridge.delete()
+        self.assertEqual(self.search('холодильник'), [])
+
+    def test_punctuation_only_query_matches_nothing(self):
+        self.assertEqual(self.search('"*()'), [])
+
+    def test_falls_back_to_icontains_without_fts5(self):
+        with mock.patch.object(search, 'has_fts5', return_value=False):
+            self.assertEqual(self.search('Galaxy A24'), [self.samsung.id])
@@ -3,7 +3,10 @@ from django.test import TestCase
 from ..serializers import (UserSerializer, CategorySerializer, ProductSerializer, CartUserProductSerializer,
                            OrderSerializer, OrderProductSerializer, WishlistSerializer, CommentSerializer,
                            ReplySerializer)
-from ..models import Category, Product, CartUserProduct, Order, OrderProduct, Wishlist, Comment, Reply
+from ..values_serializers import ProductValuesSerializer, OrderValuesSerializer
+from ..models import (Category, Product, CartUserProduct, Order, OrderProduct, Wishlist, Comment, Reply,
+                      latest_comment_fields)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.request import Request
 from rest_framework.test import APIRequestFactory, force_authenticate
 
@@ -122,7 +125,8 @@ class ProductSerializerTest(TestCase):
 
     def test_contains_expected_fields(self):
         data = self.serializer.data
-        self.assertEqual(set(data.keys()), {'id', 'name', 'description', 'price', 'category', 'image'})
+        self.assertEqual(set(data.keys()), {'id', 'name', 'description', 'price', 'category', 'image',
+                                             'image_variants', 'comment_count', 'latest_comment'})
 
     def test_name_field_content(self):
         data = self.serializer.data
@@ -224,9 +228,10 @@ class CartUserProductSerializerTest(TestCase):
         self.assertEqual(set(serializer.errors.keys()), {'quantity'})
 
     def test_create_cart_user_product(self):
+        product = Product.objects.create(name='Other Product', price=50, category=self.category)
         valid_data = {
             'user_id': self.user.id,
-            'product_id': self.product.id,
+            'product_id': product.id,
             'quantity': 3
         }
         serializer = CartUserProductSerializer(data=valid_data, context=self.serializer_context)
@@ -236,6 +241,19 @@ class CartUserProductSerializerTest(TestCase):
         self.assertEqual(cart_user_product.product_id, valid_data['product_id'])
         self.assertEqual(cart_user_product.quantity, valid_data['quantity'])
 
+    def test_create_existing_cart_user_product_adds_quantity(self):
+        valid_data = {
+            'user_id': self.user.id,
+            'product_id': self.product.id,
+            'quantity': 3
+        }
+        serializer = CartUserProductSerializer(data=valid_data, context=self.serializer_context)
+        self.assertTrue(serializer.is_valid())
+        cart_user_product = serializer.save()
+        self.assertEqual(cart_user_product.id, self.cart_user_product.id)
+        self.assertEqual(cart_user_product.quantity, 5)
+        self.assertEqual(CartUserProduct.objects.count(), 1)
+
 
 class OrderSerializerTest(TestCase):
     def setUp(self):
@@ -357,7 +375,7 @@ class CommentSerializerTest(TestCase):
 
     def test_contains_expected_fields(self):
         data = self.serializer.data
-        self.assertEqual(set(data.keys()), {'id', 'user', 'product_id', 'text', 'created_at'})
+        self.assertEqual(set(data.keys()), {'id', 'user', 'product_id', 'text', 'created_at', 'reply_count'})
 
     def test_user_field_content(self):
         data = self.serializer.data
@@ -392,4 +410,44 @@ class ReplySerializerTest(TestCase):
 
     def test_text_field_content(self):
         data = self.serializer.data
-        self.assertEqual(data['text'], self.reply_attributes['text'])
\ No newline at end of file
+        self.assertEqual(data['text'], self.reply_attributes['text'])
+
+
+class ValuesSerializerEquivalenceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category = Category.objects.create(name='Test Category')
+        self.products = [
+            Product.objects.create(name='Test Product', price=100, category=self.category),
+            Product.objects.create(name='Телефон Samsung Galaxy', description='This is a test product description',
+                                   price=150, category=self.category, image='phone-1.webp'),
+            Product.objects.create(name='With Spaces', price=1, category=self.category, image='dir/ball 1.webp'),
+        ]
+        comment = Comment.objects.create(user=self.user, product=self.products[1], text='Comment')
+        Product.objects.filter(pk=comment.product_id).update(comment_count=1, **latest_comment_fields(comment))
+        self.orders = [Order.objects.create(user=self.user, total_price=200) for _ in range(3)]
+        for order, products in zip(self.orders, [self.products, self.products[1:2], []]):
+            for product in products:
+                OrderProduct.objects.create(order=order, product=product, quantity=2, price=product.price)
+        self.renderer = JSONRenderer()
+        self.context = {'request': Request(factory.get('/products/'))}
+
+    def assertSameBytes(self, serializer, values_serializer, queryset, context):
+        expected = self.renderer.render(serializer(queryset, many=True, context=context).data)
+        rows = values_serializer.get_queryset(queryset)
+        actual = self.renderer.render(values_serializer(rows, many=True, context=context).data)
+        self.assertEqual(actual, expected)
+
+        expected = self.renderer.render(serializer(queryset.first(), context=context).data)
+        actual = self.renderer.render(values_serializer(rows.first(), context=context).data)
+        self.assertEqual(actual, expected)
+
+    def test_products(self):
+        queryset = Product.objects.order_by('id')
+        self.assertSameBytes(ProductSerializer, ProductValuesSerializer, queryset, self.context)
+        self.assertSameBytes(ProductSerializer, ProductValuesSerializer, queryset, {})
+
+    def test_orders(self):
+        queryset = Order.objects.prefetch_related('products__product')
+        self.assertSameBytes(OrderSerializer, OrderValuesSerializer, queryset, self.context)
+        self.assertSameBytes(OrderSerializer, OrderValuesSerializer, queryset, {})
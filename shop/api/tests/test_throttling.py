@@ -0,0 +1,131 @@
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import throttling
+from ..middleware import AdmissionControlMiddleware
+from ..models import Category, User
+
+SCOPES = {
+    'default': {'anon': {'rate': '3/min'}},
+    'catalog': {'anon': {'rate': '1/s', 'burst': 2}, 'user': {'rate': '10/s', 'burst': 20}},
+    'users': {'anon': {'rate': '100/min'}},
+    'signup': {'anon': {'rate': '1/h'}},
+}
+
+
+class LimiterTests(SimpleTestCase):
+    def test_token_bucket_allows_bursts_then_refills(self):
+        bucket = throttling.TokenBucket(rate=0.5, burst=3)
+        self.assertEqual([bucket.hit('key', now=100) for _ in range(4)], [0, 0, 0, 2])
+        self.assertEqual(bucket.hit('key', now=101), 1)
+        self.assertEqual(bucket.hit('key', now=102), 0)
+        self.assertEqual(bucket.hit('other', now=102), 0)
+
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate('5/s'), (5, 1))
+        self.assertEqual(throttling.parse_rate('120/min'), (120, 60))
+        self.assertEqual(throttling.parse_rate('1000/day'), (1000, 86400))
+
+    def test_backends_agree(self):
+        for backend in ('api.throttling.MemoryBackend', 'api.throttling.CacheBackend'):
+            with self.subTest(backend=backend), override_settings(THROTTLE_BACKEND=backend):
+                throttling.reset()
+                window = [throttling.check(f'{backend}:w', {'rate': '2/min'}, now=60 * 1000 + i) for i in range(3)]
+                self.assertEqual(window[:2], [0, 0])
+                self.assertGreater(window[2], 0)
+                bucket = [throttling.check(f'{backend}:b', {'rate': '1/s', 'burst': 2}, now=5000) for _ in range(3)]
+                self.assertEqual(bucket, [0, 0, 1])
+                self.assertEqual(throttling.check(f'{backend}:b', {'rate': '1/s', 'burst': 2}, now=5001), 0)
+
+
+@override_settings(THROTTLE_SCOPES=SCOPES)
+class ScopedThrottleTests(APITestCase):
+    def setUp(self):
+        throttling.reset()
+        Category.objects.create(name='Category 1')
+
+    def test_catalog_bucket_for_anonymous_clients(self):
+        codes = [self.client.get(reverse('product-list')).status_code for _ in range(3)]
+        self.assertEqual(codes, [status.HTTP_200_OK, status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS])
+        response = self.client.get(reverse('category-list'))
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.client.get(reverse('product-list'), REMOTE_ADDR='10.0.0.2').status_code,
+                         status.HTTP_200_OK)
+
+    def test_forwarded_for_does_not_change_the_key(self):
+        codes = [self.client.get(reverse('comment-list'), HTTP_X_FORWARDED_FOR=f'10.1.0.{i}').status_code
+                 for i in range(4)]
+        self.assertEqual(codes, [status.HTTP_200_OK] * 3 + [status.HTTP_429_TOO_MANY_REQUESTS])
+
+    def test_users_are_keyed_by_id(self):
+        for _ in range(2):
+            self.client.get(reverse('product-list'))
+        self.client.force_authenticate(User.objects.create_user(username='user', password='password'))
+        codes = {self.client.get(reverse('product-list')).status_code for _ in range(5)}
+        self.assertEqual(codes, {status.HTTP_200_OK})
+
+    def test_signup_has_its_own_scope(self):
+        payload = {'username': 'new-user', 'password': 'Very-Secret-42', 'email': 'new@example.com'}
+        self.assertEqual(self.client.post(reverse('user-list'), payload).status_code, status.HTTP_201_CREATED)
+        payload['username'] = 'another-user'
+        self.assertEqual(self.client.post(reverse('user-list'), payload).status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.client.get(reverse('user-list')).status_code, status.HTTP_200_OK)
+
+    def test_unscoped_views_share_the_default_limit(self):
+        codes = [self.client.get(reverse('comment-list')).status_code for _ in range(2)]
+        codes += [self.client.get(reverse('reply-list')).status_code for _ in range(2)]
+        self.assertEqual(codes, [status.HTTP_200_OK] * 3 + [status.HTTP_429_TOO_MANY_REQUESTS])
+
+
+class AdmissionControlTests(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/api/products/')
+
+    @override_settings(ADMISSION_MAX_IN_FLIGHT=1, ADMISSION_RETRY_AFTER=2)
+    def test_sheds_requests_beyond_the_limit(self):
+        nested = []
+
+        def view(request):
+            nested.append(middleware(request))
+            return HttpResponse('ok')
+
+        middleware = AdmissionControlMiddleware(view)
+        self.assertEqual(middleware(self.request).status_code, status.HTTP_200_OK)
+        self.assertEqual(nested[0].status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(nested[0]['Retry-After'], '2')
+        self.assertEqual(middleware.in_flight, 0)
+        self.assertEqual(middleware(self.request).status_code, status.HTTP_200_OK)
+
+    @override_settings(ADMISSION_MAX_IN_FLIGHT=1)
+    def test_streaming_responses_hold_their_slot_until_closed(self):
+        middleware = AdmissionControlMiddleware(lambda request: StreamingHttpResponse(iter([b'data'])))
+        response = middleware(self.request)
+        self.assertEqual(middleware.in_flight, 1)
+        self.assertEqual(middleware(self.request).status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        response.close()
+        self.assertEqual(middleware.in_flight, 0)
+
+    @override_settings(ADMISSION_MAX_IN_FLIGHT=1)
+    def test_releases_the_slot_on_errors(self):
+        def view(request):
+            raise RuntimeError
+
+        middleware = AdmissionControlMiddleware(view)
+        with self.assertRaises(RuntimeError):
+            middleware(self.request)
+        self.assertEqual(middleware.in_flight, 0)
+
+    @override_settings(ADMISSION_MAX_IN_FLIGHT=1)
+    async def test_async_requests(self):
+        async def view(request):
+            return HttpResponse('ok')
+
+        middleware = AdmissionControlMiddleware(view)
+        response = await middleware(self.request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(middleware.in_flight, 0)
@@ -1,9 +1,18 @@
 # tests.py
+import threading
+import time
+from io import StringIO
+
+from django.core.management import call_command
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from django.contrib.auth import get_user_model
-from ..models import Category, Product, CartUserProduct, Order, OrderProduct, Wishlist, Comment, Reply
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from ..models import (Category, Product, CartUserProduct, Order, OrderProduct, Wishlist, Comment, Reply,
+                      LATEST_COMMENT_LENGTH)
 
 User = get_user_model()
 
@@ -25,7 +34,7 @@ class UserViewSetTests(APITestCase):
         url = reverse('user-list')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
 
 class CategoryViewSetTests(APITestCase):
@@ -36,7 +45,7 @@ class CategoryViewSetTests(APITestCase):
         url = reverse('category-list')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
 
 class ProductViewSetTests(APITestCase):
@@ -49,7 +58,7 @@ class ProductViewSetTests(APITestCase):
         url = reverse('product-list')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
 
 class CartUserProductViewSetTests(APITestCase):
@@ -65,14 +74,15 @@ class CartUserProductViewSetTests(APITestCase):
         url = reverse('cartuserproduct-list')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_create_cart_item(self):
         url = reverse('cartuserproduct-list')
         data = {'product_id': self.product.id, 'quantity': 1}
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(CartUserProduct.objects.count(), 2)
+        self.assertEqual(CartUserProduct.objects.count(), 1)
+        self.assertEqual(response.data['quantity'], 3)
 
 
 class OrderViewSetTests(APITestCase):
@@ -90,7 +100,7 @@ class OrderViewSetTests(APITestCase):
         url = reverse('order-list')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_make_order(self):
         CartUserProduct.objects.create(user=self.user, product=self.product, quantity=2)
@@ -117,7 +127,7 @@ class WishlistViewSetTests(APITestCase):
         url = reverse('wishlist-list')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_create_wishlist_item(self):
         url = reverse('wishlist-list')
@@ -147,7 +157,7 @@ class CommentViewSetTests(APITestCase):
         url = reverse('comment-list')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_create_comment(self):
         url = reverse('comment-list')
@@ -177,7 +187,7 @@ class ReplyViewSetTests(APITestCase):
         url = reverse('reply-list')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_create_reply(self):
         url = reverse('reply-list')
@@ -191,3 +201,330 @@ class ReplyViewSetTests(APITestCase):
         response = self.client.delete(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Reply.objects.count(), 0)
+
+
+class MakeOrderQueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Product {i}', description=f'Description {i}', price=100 + i, category=self.category)
+            for i in range(500)
+        ])
+        self.client.force_authenticate(user=self.user)
+
+    def fill_cart(self, size):
+        CartUserProduct.objects.bulk_create([
+            CartUserProduct(user=self.user, product=product, quantity=2)
+            for product in self.products[:size]
+        ])
+
+    def make_order(self, size, num_queries):
+        self.fill_cart(size)
+        url = reverse('make_order')
+        with self.assertNumQueries(num_queries):
+            response = self.client.post(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['products']), size)
+        self.assertEqual(response.data['total_price'], sum((100 + i) * 2 for i in range(size)))
+        self.assertEqual(OrderProduct.objects.count(), size)
+        self.assertEqual(CartUserProduct.objects.count(), 0)
+
+    def test_make_order_single_line(self):
+        self.make_order(1, 9)
+
+    def test_make_order_ten_lines(self):
+        self.make_order(10, 9)
+
+    def test_make_order_five_hundred_lines(self):
+        # SQLite caps query parameters at 999, so bulk_create splits into batches of 249 rows.
+        self.make_order(500, 11)
+
+    def test_make_order_empty_cart(self):
+        url = reverse('make_order')
+        response = self.client.post(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), 0)
+
+
+class IndexUsageTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        self.product = Product.objects.create(name='Product 1', description='Description 1', price=100,
+                                              category=self.category)
+        self.comment = Comment.objects.create(user=self.user, product=self.product, text='Comment 1')
+        self.client.force_authenticate(user=self.user)
+
+    def assertUsesIndex(self, url, params, index):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        plan = []
+        for query in context.captured_queries:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan += [row[-1] for row in cursor.fetchall()]
+        self.assertFalse([step for step in plan if step.startswith('SCAN')], plan)
+        self.assertTrue([step for step in plan if index in step], plan)
+
+    @override_settings(CATALOG_PRICE_INDEX=False)
+    def test_products_by_category_and_price(self):
+        self.assertUsesIndex(reverse('product-list'), {
+            'category': self.category.id, 'price_gt': 10, 'price_lt': 1000, 'ordering': 'price'
+        }, 'product_category_price_idx')
+
+    @override_settings(CATALOG_PRICE_INDEX=False)
+    def test_products_by_price_range(self):
+        self.assertUsesIndex(reverse('product-list'), {'price_gt': 10, 'price_lt': 1000, 'ordering': 'price'},
+                             'product_price_idx')
+
+    def test_products_by_category(self):
+        self.assertUsesIndex(reverse('product-list'), {'category': self.category.id}, 'api_product_category_id')
+
+    def test_comments_by_product(self):
+        self.assertUsesIndex(reverse('comment-list'), {'product_id': self.product.id}, 'comment_product_created_idx')
+
+    def test_replies_by_comment(self):
+        self.assertUsesIndex(reverse('reply-list'), {'comment_id': self.comment.id}, 'reply_comment_created_idx')
+
+    def test_orders_by_user(self):
+        self.assertUsesIndex(reverse('order-list'), {}, 'order_user_created_idx')
+
+    def test_cart_by_user(self):
+        self.assertUsesIndex(reverse('cartuserproduct-list'), {}, 'api_cartuserproduct_user_id')
+
+
+class DiscussionCounterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        self.product = Product.objects.create(name='Product 1', description='Description 1', price=100,
+                                              category=self.category)
+        self.client.force_authenticate(user=self.user)
+
+    def test_comment_and_reply_counters(self):
+        response = self.client.post(reverse('comment-list'), {'product_id': self.product.id, 'text': 'Comment'},
+                                    format='json')
+        comment_id = response.data['id']
+        self.client.post(reverse('reply-list'), {'comment_id': comment_id, 'text': 'Reply 1'}, format='json')
+        response = self.client.post(reverse('reply-list'), {'comment_id': comment_id, 'text': 'Reply 2'},
+                                    format='json')
+
+        product = self.client.get(reverse('product-detail', args=[self.product.id]), format='json').json()
+        self.assertEqual(product['comment_count'], 1)
+        comments = self.client.get(reverse('comment-list'), {'product_id': self.product.id}, format='json')
+        self.assertEqual(comments.data['results'][0]['reply_count'], 2)
+
+        self.client.delete(reverse('reply-detail', args=[response.data['id']]), format='json')
+        self.assertEqual(Comment.objects.get(pk=comment_id).reply_count, 1)
+        self.client.delete(reverse('comment-detail', args=[comment_id]), format='json')
+        self.assertEqual(Product.objects.get(pk=self.product.pk).comment_count, 0)
+
+    def test_latest_comment_summary(self):
+        first = self.client.post(reverse('comment-list'), {'product_id': self.product.id, 'text': 'First'},
+                                 format='json').data
+        second = self.client.post(reverse('comment-list'),
+                                  {'product_id': self.product.id, 'text': 'x' * (LATEST_COMMENT_LENGTH + 10)},
+                                  format='json').data
+
+        product = self.client.get(reverse('product-detail', args=[self.product.id]), format='json').json()
+        self.assertEqual(product['latest_comment'], {'id': second['id'], 'text': 'x' * LATEST_COMMENT_LENGTH,
+                                                     'created_at': second['created_at']})
+
+        self.client.delete(reverse('comment-detail', args=[second['id']]), format='json')
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual((product.latest_comment_id, product.latest_comment_text), (first['id'], 'First'))
+
+        self.client.delete(reverse('comment-detail', args=[first['id']]), format='json')
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual((product.latest_comment_id, product.latest_comment_text, product.latest_comment_at),
+                         (None, '', None))
+
+    def test_recount_comments(self):
+        comment = Comment.objects.create(user=self.user, product=self.product, text='Comment 1')
+        latest = Comment.objects.create(user=self.user, product=self.product, text='Comment 2')
+        Reply.objects.create(user=self.user, comment=comment, text='Reply 1')
+        Product.objects.update(comment_count=7)
+
+        call_command('recount_comments', stdout=StringIO())
+
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.comment_count, 2)
+        self.assertEqual((product.latest_comment_id, product.latest_comment_text, product.latest_comment_at),
+                         (latest.id, 'Comment 2', latest.created_at))
+        self.assertEqual(Comment.objects.get(pk=comment.pk).reply_count, 1)
+
+
+class DiscussionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        self.product = Product.objects.create(name='Product 1', description='Description 1', price=100,
+                                              category=self.category)
+        self.other_product = Product.objects.create(name='Product 2', description='Description 2', price=200,
+                                                    category=self.category)
+        self.comments = [
+            Comment.objects.create(user=self.user, product=self.product, text=f'Comment {i}') for i in range(25)
+        ]
+        Comment.objects.create(user=self.user, product=self.other_product, text='Other comment')
+        for comment in self.comments[-2:]:
+            for i in range(5):
+                Reply.objects.create(user=self.user, comment=comment, text=f'Reply {i} to {comment.text}')
+
+    def test_discussion_in_two_queries(self):
+        url = reverse('product-discussion', args=[self.product.id])
+        with self.assertNumQueries(2):
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results[0]['text'], 'Comment 24')
+        self.assertEqual([reply['text'] for reply in results[0]['replies']],
+                         ['Reply 4 to Comment 24', 'Reply 3 to Comment 24', 'Reply 2 to Comment 24'])
+        self.assertEqual(results[0]['replies'][0]['user']['username'], 'testuser')
+        self.assertEqual(len(results[1]['replies']), 3)
+        self.assertEqual(results[2]['replies'], [])
+
+    def test_replies_preview_size(self):
+        url = reverse('product-discussion', args=[self.product.id])
+        response = self.client.get(url, {'replies': 1}, format='json')
+        self.assertEqual(len(response.data['results'][0]['replies']), 1)
+
+    def test_next_page(self):
+        url = reverse('product-discussion', args=[self.product.id])
+        response = self.client.get(url, format='json')
+        response = self.client.get(response.data['next'], format='json')
+        self.assertEqual([comment['text'] for comment in response.data['results']],
+                         [f'Comment {i}' for i in range(4, -1, -1)])
+
+    def test_query_param_route(self):
+        url = reverse('comment-discussion')
+        response = self.client.get(url, {'product_id': self.other_product.id}, format='json')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(self.client.get(url, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CartBulkTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Product {i}', description=f'Description {i}', price=100 + i, category=self.category)
+            for i in range(30)
+        ])
+        CartUserProduct.objects.create(user=self.user, product=self.products[0], quantity=5)
+        CartUserProduct.objects.create(user=self.user, product=self.products[1], quantity=1)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('cartuserproduct-bulk')
+
+    def test_upsert_and_remove(self):
+        data = {
+            'items': [{'product_id': product.id, 'quantity': 2} for product in self.products[:10]],
+            'remove': [self.products[1].id, self.products[20].id],
+        }
+        data['items'].pop(1)
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 9)
+        self.assertEqual({item['quantity'] for item in response.data}, {2})
+        self.assertEqual(CartUserProduct.objects.filter(user=self.user).count(), 9)
+        self.assertFalse(CartUserProduct.objects.filter(product=self.products[1]).exists())
+
+    def test_query_count_does_not_grow_with_items(self):
+        for size in (1, 30):
+            data = {'items': [{'product_id': product.id, 'quantity': 3} for product in self.products[:size]]}
+            # Product IN check, savepoint, upsert, release, cart read.
+            with self.assertNumQueries(5):
+                response = self.client.post(self.url, data, format='json')
+            self.assertEqual(len(response.data), max(size, 2))
+
+    def test_invalid_product(self):
+        data = {'items': [{'product_id': self.products[2].id}, {'product_id': 0}]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(CartUserProduct.objects.count(), 2)
+
+    def test_invalid_quantity(self):
+        data = {'items': [{'product_id': self.products[2].id, 'quantity': 0}]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_duplicate_product(self):
+        data = {'items': [{'product_id': self.products[2].id}, {'product_id': self.products[2].id}]}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StockReservationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        self.tracked = Product.objects.create(name='Tracked', price=100, category=self.category, stock=3)
+        self.short = Product.objects.create(name='Short', price=50, category=self.category, stock=1)
+        self.untracked = Product.objects.create(name='Untracked', price=10, category=self.category)
+        self.client.force_authenticate(user=self.user)
+
+    def test_make_order_takes_stock(self):
+        CartUserProduct.objects.create(user=self.user, product=self.tracked, quantity=2)
+        CartUserProduct.objects.create(user=self.user, product=self.untracked, quantity=5)
+        response = self.client.post(reverse('make_order'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.tracked.refresh_from_db()
+        self.untracked.refresh_from_db()
+        self.assertEqual(self.tracked.stock, 1)
+        self.assertIsNone(self.untracked.stock)
+
+    def test_make_order_conflict_lists_short_items(self):
+        CartUserProduct.objects.create(user=self.user, product=self.tracked, quantity=2)
+        CartUserProduct.objects.create(user=self.user, product=self.short, quantity=4)
+        response = self.client.post(reverse('make_order'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['items'], [{'product_id': self.short.id, 'requested': 4, 'available': 1}])
+        self.tracked.refresh_from_db()
+        self.assertEqual(self.tracked.stock, 3)
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(CartUserProduct.objects.count(), 2)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    buyers = 12
+    stock = 5
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Category 1', description='Description 1')
+        self.product = Product.objects.create(name='Product 1', price=100, category=self.category, stock=self.stock)
+        self.users = [User.objects.create(username=f'buyer{i}') for i in range(self.buyers)]
+        for user in self.users:
+            CartUserProduct.objects.create(user=user, product=self.product, quantity=1)
+
+    def checkout(self, user, barrier, results):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        barrier.wait()
+        try:
+            results.append(client.post(reverse('make_order'), format='json').status_code)
+        except Exception as exc:
+            results.append(repr(exc))
+        finally:
+            connection.close()
+
+    # The in-memory SQLite test database uses shared-cache table locks, which fail fast instead of waiting,
+    # so this exercises make_order's lock retries.
+    @override_settings(ORDER_LOCK_RETRIES=50)
+    def test_stock_never_goes_negative(self):
+        barrier = threading.Barrier(self.buyers)
+        results = []
+        threads = [threading.Thread(target=self.checkout, args=(user, barrier, results)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.product.refresh_from_db()
+        ordered = OrderProduct.objects.filter(product=self.product).count()
+        self.assertGreaterEqual(self.product.stock, 0)
+        self.assertEqual(self.product.stock + ordered, self.stock)
+        self.assertEqual(ordered, self.stock)
+        self.assertEqual(sorted(results, key=str), [status.HTTP_201_CREATED] * self.stock
+                         + [status.HTTP_409_CONFLICT] * (self.buyers - self.stock))
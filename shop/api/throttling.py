@@ -0,0 +1,159 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class SlidingWindow:
+    def __init__(self, limit, window, max_keys=100_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.counters = OrderedDict()
+        self.lock = threading.Lock()
+
+    def hit(self, key, now=None):
+        now = time.time() if now is None else now
+        current, elapsed = divmod(now, self.window)
+        with self.lock:
+            start, previous, count = self.counters.pop(key, (current, 0, 0))
+            if start != current:
+                previous, count = (count if start == current - 1 else 0), 0
+            estimate = previous * (1 - elapsed / self.window) + count
+            if estimate >= self.limit:
+                retry_after = self.window - elapsed
+                if previous and count < self.limit:
+                    retry_after = min(retry_after, (estimate - self.limit) / previous * self.window)
+                retry_after = max(1, math.ceil(retry_after))
+            else:
+                count, retry_after = count + 1, 0
+            self.counters[key] = (current, previous, count)
+            while len(self.counters) > self.max_keys:
+                self.counters.popitem(last=False)
+        return retry_after
+
+    def reset(self, key):
+        with self.lock:
+            self.counters.pop(key, None)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, max_keys=100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def hit(self, key, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens, retry_after = tokens - 1, 0
+            else:
+                retry_after = max(1, math.ceil((1 - tokens) / self.rate))
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return retry_after
+
+
+class MemoryBackend:
+    def __init__(self):
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def get_limiter(self, factory, *config):
+        with self.lock:
+            if (factory, *config) not in self.limiters:
+                self.limiters[(factory, *config)] = factory(*config)
+            return self.limiters[(factory, *config)]
+
+    def sliding_window(self, key, limit, window, now):
+        return self.get_limiter(SlidingWindow, limit, window).hit(key, now)
+
+    def token_bucket(self, key, rate, burst, now):
+        return self.get_limiter(TokenBucket, rate, burst).hit(key, now)
+
+
+class CacheBackend:
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+
+    def sliding_window(self, key, limit, window, now):
+        current, elapsed = divmod(int(now), window)
+        counter = f'throttle:{key}:{window}:{current}'
+        self.cache.add(counter, 0, window * 2)
+        count = self.cache.incr(counter)
+        previous = self.cache.get(f'throttle:{key}:{window}:{current - 1}', 0)
+        if previous * (1 - elapsed / window) + count - 1 < limit:
+            return 0
+        self.cache.decr(counter)
+        return max(1, window - elapsed)
+
+    def token_bucket(self, key, rate, burst, now):
+        name = f'throttle:{key}:{rate}:{burst}'
+        tokens, updated = self.cache.get(name, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        retry_after = 0 if tokens >= 1 else max(1, math.ceil((1 - tokens) / rate))
+        self.cache.set(name, (tokens - 1 if tokens >= 1 else tokens, now), math.ceil(burst / rate) + 1)
+        return retry_after
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    path = getattr(settings, 'THROTTLE_BACKEND', 'api.throttling.MemoryBackend')
+    if _backend is None or _backend[0] != path:
+        _backend = (path, import_string(path)())
+    return _backend[1]
+
+
+def reset():
+    global _backend
+    _backend = None
+
+
+def check(key, spec, now=None):
+    now = time.time() if now is None else now
+    count, period = parse_rate(spec['rate'])
+    if 'burst' in spec:
+        return get_backend().token_bucket(key, count / period, spec['burst'], now)
+    return get_backend().sliding_window(key, count, period, now)
+
+
+class ScopedThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        self.retry_after = None
+        scopes = getattr(settings, 'THROTTLE_SCOPES', {})
+        scope = getattr(view, 'throttle_scope', None)
+        if scope not in scopes:
+            scope = 'default'
+        config = scopes.get(scope, {})
+        if request.user and request.user.is_authenticated:
+            spec, ident = config.get('user'), f'user:{request.user.pk}'
+        else:
+            spec, ident = config.get('anon'), f'anon:{request.META.get("REMOTE_ADDR", "")}'
+        if spec is None:
+            return True
+        self.retry_after = check(f'{scope}:{ident}', spec) or None
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
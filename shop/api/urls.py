@@ -2,6 +2,7 @@ from django.urls import path, include
 
 from rest_framework import routers
 
+from . import async_views, media_views
 from .views import *
 
 router = routers.SimpleRouter()
@@ -13,8 +14,19 @@ router.register(r'orders', OrderViewSet)
 router.register(r'wishlist', WishlistViewSet)
 router.register(r'comments', CommentViewSet)
 router.register(r'replies', ReplyViewSet)
+router.register(r'image-jobs', ImageJobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('make-order/', make_order, name='make_order'),
+    path('instrumentation/', instrumentation_stats, name='instrumentation'),
+    path('products/<int:product_id>/discussion/', CommentViewSet.as_view({'get': 'discussion'}),
+         name='product-discussion'),
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('async/categories/', async_views.category_list, name='async-category-list'),
+    path('async/categories/<int:pk>/', async_views.category_detail, name='async-category-detail'),
+    path('async/comments/', async_views.comment_list, name='async-comment-list'),
+    path('async/replies/', async_views.reply_list, name='async-reply-list'),
+    path('images/<int:size>/<path:name>', media_views.image_variant, name='image-variant'),
 ]
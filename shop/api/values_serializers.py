@@ -0,0 +1,120 @@
+from itertools import groupby
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+
+from .images import make_variant_urls
+from .instrumentation import measure
+from .models import OrderProduct, Product
+
+PRODUCT_VALUES = ('id', 'name', 'description', 'price', 'image', 'comment_count', 'latest_comment',
+                  'latest_comment_text', 'latest_comment_at', 'category')
+
+
+def make_image_url(request):
+    base_url = Product._meta.get_field('image').storage.base_url
+    if request is not None:
+        base_url = request.build_absolute_uri(base_url)
+
+    def image_url(name):
+        return base_url + filepath_to_uri(name).lstrip('/') if name else None
+
+    return image_url
+
+
+def make_datetime(output_timezone):
+    def format_datetime(value):
+        if not value:
+            return None
+        if output_timezone is not None:
+            value = value.astimezone(output_timezone)
+        value = value.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    return format_datetime
+
+
+class ValuesSerializer:
+    values = ()
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.image_url = make_image_url(self.context.get('request'))
+        self.variant_urls = make_variant_urls(self.context.get('request'))
+        self.format_datetime = make_datetime(timezone.get_current_timezone() if settings.USE_TZ else None)
+
+    @classmethod
+    def get_queryset(cls, queryset):
+        return queryset.values(*cls.values)
+
+    def prefetch(self, rows):
+        pass
+
+    def to_representation(self, row):
+        raise NotImplementedError('`to_representation()` must be implemented.')
+
+    @property
+    @measure('serialize')
+    def data(self):
+        rows = list(self.instance) if self.many else [self.instance]
+        self.prefetch(rows)
+        results = [self.to_representation(row) for row in rows]
+        return results if self.many else results[0]
+
+
+class ProductValuesSerializer(ValuesSerializer):
+    values = PRODUCT_VALUES
+
+    def to_representation(self, row, prefix=''):
+        return {
+            'id': row[prefix + 'id'],
+            'name': row[prefix + 'name'],
+            'description': row[prefix + 'description'],
+            'price': row[prefix + 'price'],
+            'image': self.image_url(row[prefix + 'image']),
+            'image_variants': self.variant_urls(row[prefix + 'image']),
+            'comment_count': row[prefix + 'comment_count'],
+            'latest_comment': {
+                'id': row[prefix + 'latest_comment'],
+                'text': row[prefix + 'latest_comment_text'],
+                'created_at': self.format_datetime(row[prefix + 'latest_comment_at']),
+            } if row[prefix + 'latest_comment'] is not None else None,
+            'category': row[prefix + 'category'],
+        }
+
+
+class OrderValuesSerializer(ValuesSerializer):
+    values = ('id', 'user', 'total_price', 'created_at')
+
+    def prefetch(self, rows):
+        order_products = (
+            OrderProduct.objects
+            .filter(order_id__in=[row['id'] for row in rows])
+            .order_by('order_id', 'id')
+            .values('order_id', 'id', 'quantity', 'price', *(f'product__{field}' for field in PRODUCT_VALUES))
+        )
+        self.product_serializer = ProductValuesSerializer(context=self.context)
+        self.products = {
+            order_id: list(group)
+            for order_id, group in groupby(order_products, key=lambda order_product: order_product['order_id'])
+        }
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'user': row['user'],
+            'total_price': row['total_price'],
+            'created_at': self.format_datetime(row['created_at']),
+            'products': [
+                {
+                    'id': order_product['id'],
+                    'product': self.product_serializer.to_representation(order_product, prefix='product__'),
+                    'quantity': order_product['quantity'],
+                    'price': order_product['price'],
+                }
+                for order_product in self.products.get(row['id'], [])
+            ],
+        }
@@ -1,37 +1,100 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import Count, F, Max, Window
+from django.db.models.functions import RowNumber
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.filters import OrderingFilter
-from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 
-from .filters import ProductFilter
+from . import facets, instrumentation, inventory, price_index
+from .cache import CatalogCacheMixin, bump_generation, get_generation, get_last_modified
+from .filters import ProductFilter, CommentFilter, ReplyFilter
+from .idempotency import IdempotencyMixin, idempotent
+from .mixins import ConditionalGetMixin, QuerysetPlanningMixin, StreamingListMixin, ValuesReadMixin
 from .serializers import *
+from .values_serializers import OrderValuesSerializer, ProductValuesSerializer
 
 from rest_framework import viewsets, status
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(QuerysetPlanningMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'users'
+
+    def initial(self, request, *args, **kwargs):
+        if self.action == 'create':
+            self.throttle_scope = 'signup'
+        super().initial(request, *args, **kwargs)
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, CatalogCacheMixin, QuerysetPlanningMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    throttle_scope = 'catalog'
 
+    def get_validators(self):
+        return get_generation(), get_last_modified(Category)
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+
+class ProductViewSet(ConditionalGetMixin, CatalogCacheMixin, ValuesReadMixin, QuerysetPlanningMixin,
+                     viewsets.ReadOnlyModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    values_serializer_class = ProductValuesSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'catalog'
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = ProductFilter
     ordering_fields = ['id', 'price']
     ordering = ['id']
+    price_index_params = {'price_gt', 'price_lt', 'category', 'ordering', 'cursor', 'page_size', 'count', 'format',
+                          'facets', 'price_bucket'}
+
+    def get_validators(self):
+        return get_generation(), get_last_modified(Product)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.query_params.get('q', '').strip():
+            self.ordering = ['search_rank']
+
+    def use_price_index(self):
+        params = self.request.query_params
+        return (getattr(settings, 'CATALOG_PRICE_INDEX', False) and self.action == 'list' and self.use_values()
+                and params.get('ordering') in ('price', '-price') and set(params) <= self.price_index_params)
+
+    def filter_queryset(self, queryset):
+        if self.use_price_index():
+            filterset = ProductFilter(self.request.query_params, queryset=queryset)
+            if filterset.is_valid():
+                data = filterset.form.cleaned_data
+                indexed = price_index.query(queryset, data['price_gt'], data['price_lt'], data['category'])
+                if indexed is not None:
+                    return indexed
+        return super().filter_queryset(queryset)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.request.query_params.get('facets') in ('1', 'true'):
+            queryset = ProductFilter(self.request.query_params, queryset=Product.objects.all()).qs
+            response.data['facets'] = facets.compute(queryset, self.get_price_bucket())
+        return response
 
+    def get_price_bucket(self):
+        try:
+            return max(int(self.request.query_params['price_bucket']), 1)
+        except (KeyError, ValueError):
+            return getattr(settings, 'CATALOG_FACET_PRICE_BUCKET', 1000)
 
-class CartUserProductViewSet(viewsets.ModelViewSet):
+
+class CartUserProductViewSet(IdempotencyMixin, StreamingListMixin, QuerysetPlanningMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = CartUserProduct.objects.all()
     serializer_class = CartUserProductSerializer
@@ -39,49 +102,91 @@ class CartUserProductViewSet(viewsets.ModelViewSet):
     filterset_fields = ['user']
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         if self.request.user.is_staff:
-            return CartUserProduct.objects.all()
-        return CartUserProduct.objects.filter(user_id=self.request.user)
+            return queryset
+        return queryset.filter(user_id=self.request.user)
+
+    @action(detail=False, methods=['post'], serializer_class=CartBulkSerializer)
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cart = serializer.save()
+        return Response(CartUserProductSerializer(cart, many=True, context=self.get_serializer_context()).data)
 
 
-class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+class OrderViewSet(ConditionalGetMixin, StreamingListMixin, ValuesReadMixin, QuerysetPlanningMixin,
+                   viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    values_serializer_class = OrderValuesSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['user']
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         if self.request.user.is_staff:
-            return Order.objects.all().prefetch_related('products')
-        return Order.objects.filter(user_id=self.request.user).prefetch_related('products')
+            return queryset
+        return queryset.filter(user_id=self.request.user)
+
+    def get_validators(self):
+        orders = self.get_queryset().aggregate(count=Count('id'), last_created=Max('created_at'))
+        last_modified = max(filter(None, [orders['last_created'], get_last_modified(Product)]), default=None)
+        return (orders['count'], orders['last_created'], get_generation()), last_modified
+
+
+def place_order(request):
+    try:
+        with transaction.atomic():
+            cart_items = list(
+                CartUserProduct.objects
+                .filter(user_id=request.user)
+                .values_list('id', 'product_id', 'quantity', 'product__price', 'product__stock')
+            )
+            if not cart_items:
+                return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
+
+            inventory.reserve({
+                product_id: quantity
+                for _, product_id, quantity, _, stock in cart_items
+                if stock is not None
+            })
+
+            total_price = sum(price * quantity for _, _, quantity, price, _ in cart_items)
+
+            order = Order.objects.create(user=request.user, total_price=total_price)
+            OrderProduct.objects.bulk_create([
+                OrderProduct(order=order, product_id=product_id, quantity=quantity, price=price)
+                for _, product_id, quantity, price, _ in cart_items
+            ])
+            CartUserProduct.objects.filter(id__in=[item[0] for item in cart_items]).delete()
 
+            order = Order.objects.prefetch_related('products__product').get(pk=order.pk)
+            return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+    except inventory.OutOfStock as exc:
+        return Response({'error': 'Insufficient stock', 'items': exc.shortages()}, status=status.HTTP_409_CONFLICT)
 
+
+# Nothing is committed before place_order returns, so a lock error anywhere in it is safe to retry.
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def make_order(request):
-    cart_items = CartUserProduct.objects.filter(user_id=request.user)
-    if not cart_items:
-        return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
-
-    total_price = 0
-    for item in cart_items:
-        total_price += item.product.price * item.quantity
-
-    order = Order.objects.create(user=request.user, total_price=total_price)
-    for item in cart_items:
-        OrderProduct.objects.create(
-            order=order,
-            product=item.product,
-            quantity=item.quantity,
-            price=item.product.price
-        )
-        item.delete()
-    serializer = OrderSerializer(order)
-    return Response(serializer.data, status=status.HTTP_201_CREATED)
+    retries = getattr(settings, 'ORDER_LOCK_RETRIES', 10)
+    for attempt in range(retries + 1):
+        try:
+            return place_order(request)
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+        if attempt < retries:
+            time.sleep(min(0.005 * 2 ** attempt, 0.1) * random.uniform(0.5, 1))
+    return Response({'error': 'Database is busy, try again later'}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={'Retry-After': '1'})
 
 
-class WishlistViewSet(viewsets.ModelViewSet):
+class WishlistViewSet(QuerysetPlanningMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Wishlist.objects.all()
     serializer_class = WishlistSerializer
@@ -89,15 +194,44 @@ class WishlistViewSet(viewsets.ModelViewSet):
     filterset_fields = ['product_id']
 
     def get_queryset(self):
-        return Wishlist.objects.filter(user_id=self.request.user)
+        return super().get_queryset().filter(user_id=self.request.user)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(QuerysetPlanningMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly]
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['product_id']
+    filterset_class = CommentFilter
+    replies_preview = 3
+    max_replies_preview = 20
+
+    @action(detail=False)
+    def discussion(self, request, product_id=None):
+        try:
+            product_id = int(product_id or request.query_params['product_id'])
+            preview = min(int(request.query_params.get('replies', self.replies_preview)), self.max_replies_preview)
+        except (KeyError, ValueError):
+            return Response({'error': 'product_id and replies must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        comments = self.paginate_queryset(self.get_queryset().filter(product_id=product_id))
+        replies = (
+            Reply.objects
+            .select_related('user')
+            .filter(comment_id__in=[comment.id for comment in comments])
+            .annotate(position=Window(RowNumber(), partition_by=F('comment_id'),
+                                      order_by=[F('created_at').desc(), F('id').desc()]))
+            .filter(position__lte=preview)
+            .order_by('comment_id', 'position')
+        )
+
+        data = self.get_serializer(comments, many=True).data
+        threads = {comment['id']: comment for comment in data}
+        for comment in data:
+            comment['replies'] = []
+        for reply in ReplySerializer(replies, many=True, context=self.get_serializer_context()).data:
+            threads[reply['comment_id']]['replies'].append(reply)
+        return self.get_paginated_response(data)
 
     def destroy(self, request, *args, **kwargs):
         comment = self.get_object()
@@ -105,16 +239,51 @@ class CommentViewSet(viewsets.ModelViewSet):
             return Response(status=status.HTTP_403_FORBIDDEN)
         return super().destroy(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            Product.objects.filter(pk=instance.product_id).update(comment_count=F('comment_count') - 1,
+                                                                  **newest_comment_fields())
+            transaction.on_commit(bump_generation)
+
 
-class ReplyViewSet(viewsets.ModelViewSet):
+class ReplyViewSet(QuerysetPlanningMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly]
     queryset = Reply.objects.all()
     serializer_class = ReplySerializer
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['comment_id']
+    filterset_class = ReplyFilter
 
     def destroy(self, request, *args, **kwargs):
         reply = self.get_object()
         if reply.user != request.user:
             return Response(status=status.HTTP_403_FORBIDDEN)
         return super().destroy(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            Comment.objects.filter(pk=instance.comment_id).update(reply_count=F('reply_count') - 1)
+
+
+class ImageJobViewSet(viewsets.ReadOnlyModelViewSet):
+    permission_classes = [IsAdminUser]
+    queryset = ImageJob.objects.all()
+    serializer_class = ImageJobSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['status', 'product']
+    ordering = '-id'
+
+    @action(detail=False)
+    def summary(self, request):
+        counts = dict(ImageJob.objects.values_list('status').annotate(count=Count('id')).order_by())
+        return Response({value: counts.get(value, 0) for value, _ in ImageJob.STATUS_CHOICES})
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def instrumentation_stats(request):
+    if request.method == 'DELETE':
+        instrumentation.registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(instrumentation.registry.snapshot())
@@ -0,0 +1,71 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+from . import hashing
+
+_users = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE', 'default')]
+
+
+def get_version(user_id):
+    key = f'auth-user-version:{user_id}'
+    version = get_cache().get(key)
+    if version is None:
+        get_cache().add(key, time.time_ns(), None)
+        version = get_cache().get(key)
+    return version
+
+
+def invalidate(user_id):
+    get_cache().set(f'auth-user-version:{user_id}', time.time_ns(), None)
+    with _lock:
+        _users.pop(user_id, None)
+
+
+class CachedModelBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            hashing.burn(password)
+            return None
+        if hashing.verify(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        size = getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024)
+        if not size:
+            return super().get_user(user_id)
+        version = get_version(user_id)
+        now = time.monotonic()
+        with _lock:
+            entry = _users.get(user_id)
+            if entry is not None and entry[0] == version and entry[1] > now:
+                _users.move_to_end(user_id)
+                return copy.copy(entry[2])
+        user = super().get_user(user_id)
+        if user is None:
+            return None
+        with _lock:
+            _users[user_id] = (version, now + getattr(settings, 'AUTH_USER_CACHE_TTL', 5), user)
+            _users.move_to_end(user_id)
+            while len(_users) > size:
+                _users.popitem(last=False)
+        return copy.copy(user)
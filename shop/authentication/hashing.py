@@ -0,0 +1,46 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class Busy(Exception):
+    pass
+
+
+_pool = None
+_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    config = (getattr(settings, 'LOGIN_HASH_WORKERS', 2), getattr(settings, 'LOGIN_HASH_QUEUE', 4))
+    with _lock:
+        if _pool is None or _pool[0] != config:
+            workers, queue = config
+            _pool = (config, ThreadPoolExecutor(workers, thread_name_prefix='password-hasher'),
+                     threading.BoundedSemaphore(workers + queue))
+        return _pool[1:]
+
+
+def submit(func, *args):
+    executor, slots = get_pool()
+    if not slots.acquire(blocking=False):
+        raise Busy
+    try:
+        return executor.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+def verify(user, password):
+    is_correct, must_update = submit(hashers.verify_password, password, user.password)
+    if is_correct and must_update:
+        user.password = submit(hashers.make_password, password)
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+def burn(password):
+    submit(hashers.make_password, password)
@@ -0,0 +1,33 @@
+from django.conf import settings
+
+from api.throttling import SlidingWindow
+
+_limiters = {}
+
+
+def get_limiters():
+    config = getattr(settings, 'LOGIN_RATE_LIMITS', {'ip': (30, 60), 'username': (10, 60)})
+    key = tuple(sorted(config.items()))
+    if key not in _limiters:
+        _limiters.clear()
+        _limiters[key] = {scope: SlidingWindow(limit, window) for scope, (limit, window) in config.items()}
+    return _limiters[key]
+
+
+def get_keys(request, username):
+    return {'ip': request.META.get('REMOTE_ADDR', ''), 'username': str(username or '').casefold()}
+
+
+def hit(request, username):
+    keys = get_keys(request, username)
+    return max((limiter.hit(keys[scope]) for scope, limiter in get_limiters().items()), default=0)
+
+
+def succeeded(request, username):
+    limiter = get_limiters().get('username')
+    if limiter is not None:
+        limiter.reset(get_keys(request, username)['username'])
+
+
+def reset():
+    _limiters.clear()
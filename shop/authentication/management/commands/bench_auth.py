@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from api.models import User
+from authentication import tokens
+
+CONFIGURATIONS = (
+    ('db sessions, ModelBackend', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    }),
+    ('cached sessions, user LRU', {}),
+    ('bearer token', {}),
+)
+ENDPOINTS = (('check', 'check'), ('wishlist', 'wishlist-list'))
+
+
+class Command(BaseCommand):
+    help = 'Measure per-request authentication overhead for the session and user cache configurations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+
+    @override_settings(THROTTLE_SCOPES={})
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            user = User.objects.create_user(username='bench', password='bench-password')
+            for label, overrides in CONFIGURATIONS:
+                with override_settings(**overrides):
+                    if label == 'bearer token':
+                        client = Client(HTTP_AUTHORIZATION=f'Bearer {tokens.issue(user)["access"]}')
+                    else:
+                        client = Client()
+                        client.force_login(user)
+                    for name, url_name in ENDPOINTS:
+                        url = reverse(url_name)
+                        client.get(url)
+                        queries = self.count_queries(lambda: client.get(url))
+                        elapsed = self.measure(lambda: client.get(url), options['requests'])
+                        self.stdout.write(f'{label:>26} {name:>9}: {elapsed * 1e6:7.1f} us per request, '
+                                          f'{queries} queries')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    @staticmethod
+    def count_queries(func):
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            func()
+        return len(queries)
+
+    @staticmethod
+    def measure(func, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat
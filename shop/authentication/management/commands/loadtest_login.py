@@ -0,0 +1,89 @@
+import json
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Fire concurrent logins at a running server and report latency percentiles per status. '
+            'Raise LOGIN_RATE_LIMITS on the server first to measure hashing rather than rate limiting.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/auth/login/')
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--bad-ratio', type=float, default=0.5,
+                            help='Share of attempts that use a wrong password or an unknown username.')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--probe-url', help='GET this URL back to back during the run to see how other '
+                                                'requests fare while logins are hashing.')
+
+    def handle(self, *args, **options):
+        bad_every = round(1 / options['bad_ratio']) if options['bad_ratio'] else 0
+
+        def attempt(number):
+            username, password = options['username'], options['password']
+            if bad_every and number % bad_every == 0:
+                username, password = (f'unknown-{number}', password) if number % 2 else (username, 'wrong')
+            body = json.dumps({'username': username, 'password': password, 'session': False}).encode()
+            request = Request(options['url'], body, {'Content-Type': 'application/json'})
+            start = time.perf_counter()
+            try:
+                with urlopen(request, timeout=options['timeout']) as response:
+                    response.read()
+                    code = response.status
+            except HTTPError as exc:
+                code = exc.code
+            except (URLError, TimeoutError) as exc:
+                code = type(exc).__name__
+            return code, time.perf_counter() - start
+
+        probes, done = [], threading.Event()
+
+        def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    with urlopen(options['probe_url'], timeout=options['timeout']) as response:
+                        response.read()
+                except (HTTPError, URLError, TimeoutError):
+                    continue
+                probes.append(time.perf_counter() - start)
+
+        prober = threading.Thread(target=probe, daemon=True)
+        if options['probe_url']:
+            prober.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(attempt, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+        done.set()
+        if prober.is_alive():
+            prober.join()
+        if all(isinstance(code, str) for code, _ in results):
+            raise CommandError(f'No response from {options["url"]}.')
+
+        self.stdout.write(f'{len(results)} logins in {elapsed:.1f} s ({len(results) / elapsed:.1f}/s), '
+                          f'concurrency {options["concurrency"]}')
+        self.report('all', [latency for _, latency in results])
+        for code, count in sorted(Counter(code for code, _ in results).items(), key=str):
+            self.report(f'{code} x{count}', [latency for result, latency in results if result == code])
+        if probes:
+            self.report(f'probe x{len(probes)}', probes)
+
+    def report(self, label, latencies):
+        latencies = sorted(latencies)
+        if len(latencies) > 1:
+            p50, p95, p99 = (statistics.quantiles(latencies, n=100, method='inclusive')[i] for i in (49, 94, 98))
+        else:
+            p50 = p95 = p99 = latencies[0]
+        self.stdout.write(f'  {label:>10}: p50 {p50 * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms  '
+                          f'p99 {p99 * 1000:7.1f} ms  max {latencies[-1] * 1000:7.1f} ms')
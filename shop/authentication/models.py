@@ -0,0 +1,8 @@
+from django.db.models import *
+from django.utils import timezone
+
+
+class RevokedToken(Model):
+    sid = CharField(max_length=32, unique=True)
+    revoked_at = DateTimeField(default=timezone.now, db_index=True)
+    expires_at = DateTimeField(db_index=True)
@@ -0,0 +1,84 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.models import Session
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_pending = {}
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_writer = None
+
+
+def get_delay():
+    return getattr(settings, 'SESSION_WRITE_BEHIND_DELAY', 5)
+
+
+def write_pending():
+    with _write_lock:
+        with _lock:
+            batch = list(_pending.values())
+        if not batch:
+            return 0
+        Session.objects.bulk_create(batch, update_conflicts=True, unique_fields=['session_key'],
+                                    update_fields=['session_data', 'expire_date'])
+        with _lock:
+            for session in batch:
+                if _pending.get(session.session_key) is session:
+                    del _pending[session.session_key]
+        return len(batch)
+
+
+def run_writer():
+    while (delay := get_delay()) > 0:
+        time.sleep(delay)
+        try:
+            write_pending()
+        except Exception:
+            logger.exception('Could not write %s pending sessions', len(_pending))
+        finally:
+            close_old_connections()
+
+
+def start_writer():
+    global _writer
+    with _lock:
+        if _writer is None:
+            atexit.register(write_pending)
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=run_writer, name='session-writer', daemon=True)
+            _writer.start()
+
+
+class SessionStore(cached_db.SessionStore):
+    def _get_session_from_db(self):
+        with _lock:
+            session = _pending.get(self.session_key)
+        if session is None:
+            return super()._get_session_from_db()
+        return session if session.expire_date > timezone.now() else None
+
+    def exists(self, session_key):
+        return session_key in _pending or super().exists(session_key)
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None or get_delay() <= 0:
+            return super().save(must_create)
+        session = self.create_model_instance(self._get_session())
+        with _lock:
+            _pending[session.session_key] = session
+        self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+        start_writer()
+
+    def delete(self, session_key=None):
+        with _write_lock:
+            with _lock:
+                _pending.pop(session_key or self.session_key, None)
+            super().delete(session_key)
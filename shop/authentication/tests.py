@@ -1,14 +1,27 @@
 # tests.py
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.sessions.models import Session
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from django.contrib.auth import get_user_model
 
+from api.models import Category, Product, Wishlist
+from . import backends, hashing, limits, sessions, tokens
+from .models import RevokedToken
+
 User = get_user_model()
 
 
 class AuthenticationTests(APITestCase):
     def setUp(self):
+        limits.reset()
         self.user = User.objects.create_user(username='testuser', password='testpass')
 
     def test_login_success(self):
@@ -54,3 +67,263 @@ class AuthenticationTests(APITestCase):
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()['details'], 'CSRF cookie set')
+
+
+class AuthenticationFastPathTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+
+    def check(self):
+        return self.client.get(reverse('check'), format='json').json()
+
+    def test_check_authentication_is_served_from_cache(self):
+        self.check()
+        with self.assertNumQueries(0):
+            data = self.check()
+        self.assertEqual(data, {'isAuthenticated': True, 'username': 'testuser', 'id': self.user.id})
+
+    def test_user_changes_are_picked_up(self):
+        self.check()
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertEqual(self.check()['username'], 'renamed')
+
+    def test_password_change_ends_other_sessions(self):
+        self.check()
+        self.user.set_password('newpass')
+        self.user.save()
+        self.assertFalse(self.check()['isAuthenticated'])
+
+    def test_logout_forgets_the_user(self):
+        self.check()
+        self.assertIn(self.user.id, backends._users)
+        self.client.post(reverse('logout_view'), format='json')
+        self.assertNotIn(self.user.id, backends._users)
+        self.assertFalse(self.check()['isAuthenticated'])
+
+    @override_settings(AUTH_USER_CACHE_SIZE=2)
+    def test_cache_keeps_recently_used_users(self):
+        users = [User.objects.create_user(username=f'user{i}', password='password') for i in range(3)]
+        backend = backends.CachedModelBackend()
+        for user in users:
+            backend.get_user(user.id)
+        backend.get_user(users[1].id)
+        self.assertEqual(list(backends._users)[-2:], [users[2].id, users[1].id])
+        self.assertNotIn(users[0].id, backends._users)
+
+    def test_cached_users_expire(self):
+        backend = backends.CachedModelBackend()
+        backend.get_user(self.user.id)
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        self.assertIsNotNone(backend.get_user(self.user.id))
+        with mock.patch.object(backends.time, 'monotonic', return_value=time.monotonic() + 6):
+            self.assertIsNone(backend.get_user(self.user.id))
+
+    def test_cached_user_is_not_shared_between_requests(self):
+        backend = backends.CachedModelBackend()
+        first = backend.get_user(self.user.id)
+        first.first_name = 'Changed'
+        self.assertEqual(backend.get_user(self.user.id).first_name, '')
+
+
+@override_settings(SESSION_WRITE_BEHIND_DELAY=60)
+@mock.patch.object(sessions, 'start_writer')
+class WriteBehindSessionTests(TestCase):
+    def setUp(self):
+        self.session = sessions.SessionStore()
+        self.session['cart'] = 1
+        self.session.create()
+
+    def tearDown(self):
+        sessions._pending.clear()
+
+    def stored(self):
+        return Session.objects.get(session_key=self.session.session_key).get_decoded()
+
+    def test_created_sessions_are_written_through(self, start_writer):
+        self.assertEqual(self.stored(), {'cart': 1})
+        start_writer.assert_not_called()
+
+    def test_updates_are_deferred_and_batched(self, start_writer):
+        self.session['cart'] = 2
+        with self.assertNumQueries(0):
+            self.session.save()
+        start_writer.assert_called_once()
+        self.assertEqual(self.stored(), {'cart': 1})
+
+        self.session._cache.delete(self.session.cache_key)
+        self.assertEqual(sessions.SessionStore(self.session.session_key).load(), {'cart': 2})
+
+        self.assertEqual(sessions.write_pending(), 1)
+        self.assertEqual(self.stored(), {'cart': 2})
+        self.assertEqual(sessions._pending, {})
+
+    def test_delete_drops_pending_writes(self, start_writer):
+        self.session['cart'] = 2
+        self.session.save()
+        self.session.delete()
+        self.assertEqual(sessions.write_pending(), 0)
+        self.assertFalse(Session.objects.filter(session_key=self.session.session_key).exists())
+
+
+class TokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        limits.reset()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient(enforce_csrf_checks=True)
+        response = self.client.post(reverse('login_view'), {'username': 'testuser', 'password': 'testpass',
+                                                            'session': False}, format='json')
+        self.tokens = response.json()
+
+    def check(self, token=None):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token or self.tokens["access"]}')
+        return self.client.get(reverse('check'), format='json')
+
+    def refresh(self, token=None):
+        return self.client.post(reverse('token_refresh'), {'refresh': token or self.tokens['refresh']},
+                                format='json')
+
+    def test_login_issues_tokens_without_a_session(self):
+        self.assertEqual(self.tokens['token_type'], 'Bearer')
+        self.assertEqual(self.tokens['expires_in'], 300)
+        self.assertNotIn('sessionid', self.client.cookies)
+        self.assertEqual(self.check().json(), {'isAuthenticated': True, 'username': 'testuser',
+                                               'id': self.user.id})
+
+    @override_settings(TOKEN_REVOCATION_SYNC_INTERVAL=60)
+    def test_verified_without_queries(self):
+        self.check()
+        with self.assertNumQueries(0):
+            self.assertTrue(self.check().json()['isAuthenticated'])
+
+    def test_unsafe_requests_skip_csrf(self):
+        product = Product.objects.create(name='Product 1', price=100,
+                                         category=Category.objects.create(name='Category 1'))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        response = self.client.post(reverse('wishlist-list'), {'product_id': product.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Wishlist.objects.filter(user=self.user, product=product).exists())
+
+    def test_rejects_tampered_and_wrong_kind_tokens(self):
+        self.assertEqual(self.check(self.tokens['access'][:-2] + 'xx').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.check(self.tokens['refresh']).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.refresh(self.tokens['access']).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_ACCESS_LIFETIME=-1)
+    def test_expired_access_token(self):
+        response = self.check()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json()['detail'], 'Token has expired.')
+
+    def test_refresh_issues_an_access_token(self):
+        response = self.refresh()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('refresh', response.json())
+        self.assertTrue(self.check(response.json()['access']).json()['isAuthenticated'])
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        self.assertEqual(self.client.post(reverse('logout_view'), format='json').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.check().json()['detail'], 'Token has been revoked.')
+        self.assertEqual(self.refresh().json()['error'], 'Token has been revoked.')
+
+    @override_settings(TOKEN_REVOCATION_SYNC_INTERVAL=0)
+    def test_revocations_from_other_processes_are_synced(self):
+        self.check()
+        claims = tokens.decode(self.tokens['access'], tokens.ACCESS)
+        RevokedToken.objects.create(sid=claims['s'], expires_at=timezone.now() + timedelta(days=1))
+        self.assertEqual(self.check().status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_password_change_invalidates_tokens(self):
+        self.user.set_password('newpass')
+        self.user.save()
+        self.assertEqual(self.check().status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.refresh().status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class RevocationListTests(TestCase):
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        revoked = tokens.RevocationList(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            revoked.add(f'revoked-{i}')
+        self.assertTrue(all(f'revoked-{i}' in revoked for i in range(1000)))
+        false_positives = sum(f'valid-{i}' in revoked for i in range(10_000))
+        self.assertLess(false_positives, 300)
+        self.assertLess(len(revoked.bits), 1300)
+
+
+@override_settings(LOGIN_RATE_LIMITS={'ip': (6, 60), 'username': (3, 60)})
+class LoginPipelineTests(APITestCase):
+    def setUp(self):
+        limits.reset()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+
+    def login(self, username='testuser', password='wrongpass', **extra):
+        return self.client.post(reverse('login_view'), {'username': username, 'password': password,
+                                                        'session': False}, format='json', **extra)
+
+    def test_username_is_limited_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, status.HTTP_400_BAD_REQUEST)
+        with mock.patch.object(hashing, 'submit') as submit:
+            response = self.login(username='TestUser', password='testpass')
+        submit.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.2').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_ip_is_limited_across_usernames(self):
+        for i in range(6):
+            self.assertEqual(self.login(username=f'unknown{i}').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.login(username='other').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login(username='other', REMOTE_ADDR='10.0.0.2').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_successful_login_resets_the_username_limit(self):
+        self.login()
+        self.login()
+        self.assertEqual(self.login(password='testpass').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.login().status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login_rehashes_to_the_preferred_hasher(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password('testpass', hasher='pbkdf2_sha256'))
+        self.assertEqual(self.login(password='wrongpass').status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+        self.assertEqual(self.login(password='testpass').status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+        self.assertTrue(self.user.check_password('testpass'))
+
+    @override_settings(LOGIN_HASH_WORKERS=1, LOGIN_HASH_QUEUE=0)
+    def test_saturated_hash_pool_answers_busy(self):
+        _, slots = hashing.get_pool()
+        slots.acquire()
+        try:
+            start = time.monotonic()
+            response = self.login(password='testpass')
+            self.assertLess(time.monotonic() - start, 0.5)
+        finally:
+            slots.release()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.login(password='testpass').status_code, status.HTTP_200_OK)
+
+
+class SlidingWindowTests(TestCase):
+    def test_previous_window_is_weighted_by_overlap(self):
+        limiter = limits.SlidingWindow(limit=4, window=60)
+        for second in range(4):
+            self.assertEqual(limiter.hit('key', now=60 + second), 0)
+        self.assertEqual(limiter.hit('key', now=90), 30)
+        self.assertEqual(limiter.hit('key', now=135), 0)
+        self.assertEqual(limiter.hit('key', now=136), 0)
+        self.assertEqual(limiter.hit('key', now=137), 14)
+
+    def test_keys_are_bounded(self):
+        limiter = limits.SlidingWindow(limit=1, window=60, max_keys=2)
+        for key in ('a', 'b', 'c'):
+            limiter.hit(key, now=0)
+        self.assertEqual(list(limiter.counters), ['b', 'c'])
@@ -0,0 +1,149 @@
+import hashlib
+import math
+import secrets
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .backends import CachedModelBackend
+from .models import RevokedToken
+
+ACCESS, REFRESH = 'access', 'refresh'
+SALT = 'authentication.tokens'
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class RevocationList:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(math.ceil(self.size / 8))
+        self.count = 0
+        self.synced_at = None
+        self.checked_at = 0.0
+
+    def positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        if value in self:
+            return
+        for position in self.positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & 1 << (position & 7) for position in self.positions(value))
+
+
+_revoked = None
+_lock = threading.Lock()
+
+
+def get_lifetime(kind):
+    if kind == ACCESS:
+        return getattr(settings, 'TOKEN_ACCESS_LIFETIME', 60 * 5)
+    return getattr(settings, 'TOKEN_REFRESH_LIFETIME', 60 * 60 * 24 * 14)
+
+
+def get_hash(user):
+    return user.get_session_auth_hash()[:16]
+
+
+def encode(claims, kind):
+    return signing.dumps(claims, salt=f'{SALT}.{kind}')
+
+
+def decode(token, kind):
+    try:
+        return signing.loads(token, salt=f'{SALT}.{kind}', max_age=get_lifetime(kind))
+    except signing.SignatureExpired:
+        raise InvalidToken('Token has expired.')
+    except signing.BadSignature:
+        raise InvalidToken('Invalid token.')
+
+
+def issue(user, sid=None):
+    claims = {'u': user.pk, 's': sid or secrets.token_urlsafe(16), 'h': get_hash(user)}
+    tokens = {'token_type': 'Bearer', 'access': encode(claims, ACCESS), 'expires_in': get_lifetime(ACCESS)}
+    if sid is None:
+        tokens['refresh'] = encode(claims, REFRESH)
+    return tokens
+
+
+def get_user(claims):
+    if is_revoked(claims['s']):
+        raise InvalidToken('Token has been revoked.')
+    user = CachedModelBackend().get_user(claims['u'])
+    if user is None or not constant_time_compare(claims['h'], get_hash(user)):
+        raise InvalidToken('Token is no longer valid for this user.')
+    return user
+
+
+def get_revocation_list():
+    global _revoked
+    interval = getattr(settings, 'TOKEN_REVOCATION_SYNC_INTERVAL', 1)
+    with _lock:
+        if _revoked is None or _revoked.count > _revoked.capacity:
+            _revoked = RevocationList(getattr(settings, 'TOKEN_REVOCATION_CAPACITY', 100_000),
+                                      getattr(settings, 'TOKEN_REVOCATION_ERROR_RATE', 0.01))
+            RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        if time.monotonic() - _revoked.checked_at >= interval:
+            sync(_revoked)
+        return _revoked
+
+
+def sync(revoked):
+    now = timezone.now()
+    rows = RevokedToken.objects.filter(expires_at__gt=now)
+    if revoked.synced_at is not None:
+        rows = rows.filter(revoked_at__gte=revoked.synced_at - SYNC_OVERLAP)
+    for sid in rows.values_list('sid', flat=True):
+        revoked.add(sid)
+    revoked.synced_at, revoked.checked_at = now, time.monotonic()
+
+
+def is_revoked(sid):
+    return sid in get_revocation_list() and RevokedToken.objects.filter(sid=sid).exists()
+
+
+def revoke(sid):
+    RevokedToken.objects.get_or_create(
+        sid=sid, defaults={'expires_at': timezone.now() + timedelta(seconds=get_lifetime(REFRESH))},
+    )
+    revoked = get_revocation_list()
+    with _lock:
+        revoked.add(sid)
+
+
+class TokenAuthentication(BaseAuthentication):
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        header = request.META.get('HTTP_AUTHORIZATION', '').split()
+        if not header or header[0].lower() != self.keyword.lower():
+            return None
+        if len(header) != 2:
+            raise AuthenticationFailed('Invalid token header.')
+        try:
+            claims = decode(header[1], ACCESS)
+            return get_user(claims), claims
+        except InvalidToken as exc:
+            raise AuthenticationFailed(str(exc))
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -5,6 +5,7 @@ from .views import *
 urlpatterns = [
     path('login/', login_view, name='login_view'),
     path('logout/', logout_view, name='logout_view'),
+    path('token/refresh/', refresh_token, name='token_refresh'),
     path('check/', check_authentication, name='check'),
     path('csrf/', get_csrf_token, name='csrf'),
 ]
@@ -1,19 +1,33 @@
 from django.contrib.auth import authenticate, login, logout
 from django.http import JsonResponse
 from django.views.decorators.csrf import ensure_csrf_cookie
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
+from . import hashing, limits, tokens
+
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def login_view(request):
     username = request.data.get('username')
     password = request.data.get('password')
-    user = authenticate(request, username=username, password=password)
+    retry_after = limits.hit(request, username)
+    if retry_after:
+        response = JsonResponse({'error': 'Too many login attempts'}, status=429)
+        response['Retry-After'] = retry_after
+        return response
+    try:
+        user = authenticate(request, username=username, password=password)
+    except hashing.Busy:
+        response = JsonResponse({'error': 'Login is temporarily unavailable'}, status=503)
+        response['Retry-After'] = 1
+        return response
     if user is not None:
-        login(request, user)
-        return JsonResponse({'message': 'Login successful'}, status=200)
+        limits.succeeded(request, username)
+        if str(request.data.get('session', True)).lower() not in ('false', '0'):
+            login(request, user)
+        return JsonResponse({'message': 'Login successful', **tokens.issue(user)}, status=200)
     else:
         return JsonResponse({'error': 'Invalid credentials'}, status=400)
 
@@ -21,10 +35,24 @@ def login_view(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout_view(request):
+    if request.auth is not None:
+        tokens.revoke(request.auth['s'])
     logout(request)
     return JsonResponse({'message': 'Logout successful'}, status=200)
 
 
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def refresh_token(request):
+    try:
+        claims = tokens.decode(request.data.get('refresh', ''), tokens.REFRESH)
+        user = tokens.get_user(claims)
+    except tokens.InvalidToken as exc:
+        return JsonResponse({'error': str(exc)}, status=401)
+    return JsonResponse(tokens.issue(user, claims['s']), status=200)
+
+
 @api_view(['GET'])
 def check_authentication(request):
     if request.user.is_authenticated:
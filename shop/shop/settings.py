@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.AdmissionControlMiddleware',
+    'api.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +92,35 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+CATALOG_CACHE = 'default'
+CATALOG_CACHE_TIMEOUT = 60 * 5
+CATALOG_PRICE_INDEX = True
+# The price index is built on a background thread ('thread'), with price-sorted pages served by the ORM until it
+# is ready; 'eager' builds it inside the request (used by the test runner). Writes from other processes only
+# reach it through CATALOG_CACHE, so with a per-process cache it is rebuilt once it is MAX_AGE seconds old.
+CATALOG_PRICE_INDEX_MODE = 'thread'
+CATALOG_PRICE_INDEX_MAX_AGE = 60
+CATALOG_FACET_PRICE_BUCKET = 1000
+
+# Idempotency-Key records live in the database so that duplicates reaching different processes still see
+# each other. Completed responses are replayed for IDEMPOTENCY_TIMEOUT seconds, except 409 and 429, which
+# may succeed on a retry.
+IDEMPOTENCY_TIMEOUT = 60 * 60 * 24
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+IDEMPOTENCY_WAIT = 10
+
+# make_order retries SQLite "database is locked" errors this many times with a short backoff, then answers 503.
+ORDER_LOCK_RETRIES = 10
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -129,9 +162,50 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'api.User'
 
+# Stored hashes are upgraded to the first hasher on the next successful login. scrypt is memory-hard and
+# several times cheaper in CPU than PBKDF2; put Argon2PasswordHasher first instead when argon2-cffi is installed.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# (attempts, seconds) per client IP and per username, checked before any password is hashed.
+LOGIN_RATE_LIMITS = {'ip': (30, 60), 'username': (10, 60)}
+# Password hashing runs on LOGIN_HASH_WORKERS threads and at most LOGIN_HASH_QUEUE more logins wait for a
+# worker; any further login answers 503 at once. Keep the sum below the request threads per process so a
+# login storm cannot hold all of them.
+LOGIN_HASH_WORKERS = 2
+LOGIN_HASH_QUEUE = 4
+
+# Up to AUTH_USER_CACHE_SIZE users are kept in process memory. Saves and logouts bump a per-user version in
+# AUTH_USER_CACHE; with a per-process cache such as locmem other processes only notice once the entry is
+# AUTH_USER_CACHE_TTL seconds old, so that is how long a password change or deactivation may lag there.
+AUTHENTICATION_BACKENDS = ['authentication.backends.CachedModelBackend']
+AUTH_USER_CACHE = 'default'
+AUTH_USER_CACHE_SIZE = 1024
+AUTH_USER_CACHE_TTL = 5
+
+# Sessions are read from SESSION_CACHE_ALIAS; changes to existing sessions reach the database in batches
+# every SESSION_WRITE_BEHIND_DELAY seconds (0 writes through). Multi-process deployments need a shared cache.
+SESSION_ENGINE = 'authentication.sessions'
+SESSION_CACHE_ALIAS = 'default'
+SESSION_WRITE_BEHIND_DELAY = 5
+
+# Bearer tokens issued by /auth/login/. Logout revokes the whole login (access and refresh token); each
+# process checks revocations against an in-memory bloom filter synced from RevokedToken.
+TOKEN_ACCESS_LIFETIME = 60 * 5
+TOKEN_REFRESH_LIFETIME = 60 * 60 * 24 * 14
+TOKEN_REVOCATION_SYNC_INTERVAL = 1
+TOKEN_REVOCATION_CAPACITY = 100_000
+TOKEN_REVOCATION_ERROR_RATE = 0.01
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        'authentication.tokens.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -139,13 +213,44 @@ REST_FRAMEWORK = {
 
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
-    ]
+    ],
+
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.ScopedThrottle',
+    ],
 }
 
+# Views pick a scope with `throttle_scope`; unknown scopes use 'default'. Anonymous clients are keyed by
+# REMOTE_ADDR (X-Forwarded-For is client-controlled), users by id. A spec with 'burst' is a token bucket
+# refilling at 'rate', otherwise a sliding window of 'rate'.
+THROTTLE_SCOPES = {
+    'default': {'anon': {'rate': '120/min'}, 'user': {'rate': '600/min'}},
+    'catalog': {'anon': {'rate': '5/s', 'burst': 30}, 'user': {'rate': '20/s', 'burst': 60}},
+    'users': {'anon': {'rate': '30/min'}, 'user': {'rate': '300/min'}},
+    'signup': {'anon': {'rate': '5/h'}},
+}
+# 'api.throttling.CacheBackend' keeps counters in THROTTLE_CACHE so all processes share them.
+THROTTLE_BACKEND = 'api.throttling.MemoryBackend'
+THROTTLE_CACHE = 'default'
+
+# Requests beyond this many in flight per process get 503 with Retry-After instead of queueing.
+ADMISSION_MAX_IN_FLIGHT = 64
+ADMISSION_RETRY_AFTER = 1
+
+# Per-request query, serializer and render timings, sent as Server-Timing and aggregated per route at
+# /api/instrumentation/ (admin only). Requests running one SQL statement more than the threshold are logged.
+INSTRUMENTATION_ENABLED = True
+INSTRUMENTATION_SERVER_TIMING = True
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = 10
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
 ]
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 CSRF_TRUSTED_ORIGINS = [
     "http://localhost:5173",
@@ -153,3 +258,27 @@ CSRF_TRUSTED_ORIGINS = [
 
 MEDIA_ROOT = os.path.join(os.path.dirname(BASE_DIR), 'media')
 MEDIA_URL = '/media/'
+
+MEDIA_MAX_AGE = 60 * 60 * 24
+# None streams files with FileResponse (sendfile under gunicorn/uWSGI); 'x-accel-redirect' (nginx) or
+# 'x-sendfile' (Apache, lighttpd) hands the transfer to the fronting proxy instead.
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Variant URLs carry ?v=<content digest> and are cached as immutable; a missing or stale v redirects to the
+# current one, and the redirect itself is only cached for IMAGE_VARIANT_REDIRECT_MAX_AGE seconds.
+IMAGE_VARIANT_SIZES = (128, 256, 512)
+IMAGE_VARIANT_MAX_AGE = 60 * 60 * 24 * 365
+IMAGE_VARIANT_REDIRECT_MAX_AGE = 60
+
+# 'thread' runs uploads through an in-process worker pool, 'external' leaves them to
+# `manage.py run_image_workers`, 'eager' processes them inside the saving request (used by the test runner).
+IMAGE_JOBS_MODE = 'thread'
+IMAGE_JOBS_WORKERS = 2
+IMAGE_JOBS_POLL_INTERVAL = 5
+IMAGE_JOBS_MAX_ATTEMPTS = 5
+IMAGE_JOBS_BACKOFF = 5
+IMAGE_JOBS_MAX_BACKOFF = 60 * 60
+IMAGE_JOBS_LOCK_TIMEOUT = 60 * 10
+
+TEST_RUNNER = 'api.test_runner.TestRunner'
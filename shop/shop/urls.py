@@ -1,7 +1,7 @@
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from api.media_views import serve_media
 from shop import settings
 
 urlpatterns = [
@@ -9,4 +9,5 @@ urlpatterns = [
     path('api/', include('api.urls')),
     path('auth/', include('authentication.urls')),
     path('docs/', include('docs.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='media'),
+]